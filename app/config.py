@@ -1,4 +1,5 @@
 import os
+import json
 from typing import Optional
 from dotenv import load_dotenv
 
@@ -38,4 +39,78 @@ AI_BASE_URL = os.getenv("AI_BASE_URL", "https://generativelanguage.googleapis.co
 
 # Database Configuration
 DATABASE_NAME = os.getenv("DATABASE_NAME", "nexus_pdf")
-COLLECTION_NAME = os.getenv("COLLECTION_NAME", "files")
\ No newline at end of file
+COLLECTION_NAME = os.getenv("COLLECTION_NAME", "files")
+PAGES_COLLECTION_NAME = os.getenv("PAGES_COLLECTION_NAME", "file_pages")
+
+# Logging Configuration
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # "json" or "text"
+LOG_PAGE_SAMPLE_RATE = float(os.getenv("LOG_PAGE_SAMPLE_RATE", "0.1"))  # fraction of per-page info logs kept
+
+# Admission Control Configuration
+QUEUE_BACKLOG_LIMIT = int(os.getenv("QUEUE_BACKLOG_LIMIT", "500"))  # queued jobs before uploads get 429
+QUEUE_RETRY_AFTER = int(os.getenv("QUEUE_RETRY_AFTER", "30"))  # seconds suggested to throttled clients
+PDFINFO_TIMEOUT = int(os.getenv("PDFINFO_TIMEOUT", "10"))  # seconds allowed for the upload page-count probe
+
+# Per-tier processing budgets; TIER_LIMITS (JSON) overrides or adds tiers
+DEFAULT_TIER = os.getenv("DEFAULT_TIER", "free")
+TIER_LIMITS = {
+    "free": {"max_pages": 20, "base_timeout": 60, "seconds_per_page": 30, "max_timeout": 900},
+    "pro": {"max_pages": 200, "base_timeout": 60, "seconds_per_page": 30, "max_timeout": 3600},
+}
+for _tier, _limits in json.loads(os.getenv("TIER_LIMITS", "{}")).items():
+    TIER_LIMITS[_tier] = {**TIER_LIMITS.get(_tier, TIER_LIMITS["free"]), **_limits}
+
+if DEFAULT_TIER not in TIER_LIMITS:
+    raise ValueError(f"DEFAULT_TIER '{DEFAULT_TIER}' is not defined in TIER_LIMITS.")
+
+# X-Service-Tier is only honoured on requests carrying this X-Gateway-Secret; empty ignores the header
+TIER_GATEWAY_SECRET = os.getenv("TIER_GATEWAY_SECRET", "")
+
+# AI Cache and Batching Configuration
+AI_CACHE_ENABLED = os.getenv("AI_CACHE_ENABLED", "true").lower() == "true"
+AI_CACHE_TTL = int(os.getenv("AI_CACHE_TTL", "604800"))  # 7 days
+AI_BATCH_ENABLED = os.getenv("AI_BATCH_ENABLED", "false").lower() == "true"
+AI_BATCH_MAX_PAGES = int(os.getenv("AI_BATCH_MAX_PAGES", "4"))  # pages packed into one request
+AI_BATCH_MAX_BYTES = int(os.getenv("AI_BATCH_MAX_BYTES", "1048576"))  # image bytes per packed request
+AI_BATCH_PAGE_MAX_BYTES = int(os.getenv("AI_BATCH_PAGE_MAX_BYTES", "153600"))  # larger pages are sent alone
+
+# Result Combination Configuration
+RESULT_MAX_CHARS = int(os.getenv("RESULT_MAX_CHARS", "8000"))  # bound on the stored combined result
+AI_REDUCE_BATCH_SIZE = int(os.getenv("AI_REDUCE_BATCH_SIZE", "8"))  # page outputs merged per reduce call
+AI_REDUCE_CONCURRENCY = int(os.getenv("AI_REDUCE_CONCURRENCY", "4"))  # reduce calls in flight at once
+
+# Result Storage Configuration
+# Stored results are at most RESULT_MAX_CHARS * 4 UTF-8 bytes, so compression and GridFS
+# offload only kick in once that bound exceeds RESULT_COMPRESS_THRESHOLD / RESULT_INLINE_MAX_BYTES.
+# With the defaults results are compressed but stay inline; raise RESULT_MAX_CHARS above 65536
+# (or lower RESULT_INLINE_MAX_BYTES) for GridFS to be used.
+RESULT_COMPRESS_THRESHOLD = int(os.getenv("RESULT_COMPRESS_THRESHOLD", "4096"))  # bytes before results are zstd-compressed
+RESULT_INLINE_MAX_BYTES = int(os.getenv("RESULT_INLINE_MAX_BYTES", "262144"))  # compressed bytes kept inline, larger goes to GridFS
+RESULT_ZSTD_LEVEL = int(os.getenv("RESULT_ZSTD_LEVEL", "3"))
+RESULTS_BUCKET_NAME = os.getenv("RESULTS_BUCKET_NAME", "results")
+
+# Worker Configuration
+WORKER_PIPELINED = os.getenv("WORKER_PIPELINED", "false").lower() == "true"  # overlap rendering with AI calls
+WORKER_RENDER_AHEAD = int(os.getenv("WORKER_RENDER_AHEAD", "2"))  # jobs rendered ahead of the one being analyzed
+WORKER_DEQUEUE_TIMEOUT = int(os.getenv("WORKER_DEQUEUE_TIMEOUT", "5"))  # seconds per blocking dequeue poll
+
+# Retention and Cleanup Configuration
+FILE_TTL_SECONDS = int(os.getenv("FILE_TTL_SECONDS", "0"))  # 0 disables automatic expiry
+FILE_TTL_FIELD = os.getenv("FILE_TTL_FIELD", "updated_at")  # "created_at" or "updated_at"
+CLEANUP_BATCH_SIZE = int(os.getenv("CLEANUP_BATCH_SIZE", "500"))  # records per bulk delete / sweep batch
+SWEEP_INTERVAL = int(os.getenv("SWEEP_INTERVAL", "3600"))  # seconds between orphan sweeps
+SWEEP_GRACE_SECONDS = int(os.getenv("SWEEP_GRACE_SECONDS", "3600"))  # artifacts younger than this are never swept
+
+if FILE_TTL_FIELD not in ("created_at", "updated_at"):
+    raise ValueError("FILE_TTL_FIELD must be 'created_at' or 'updated_at'.")
+
+# Stale Job Recovery Configuration
+STALE_JOB_SECONDS = int(os.getenv("STALE_JOB_SECONDS", "900"))  # non-terminal status unchanged this long is checked
+JOB_HEARTBEAT_STALE_SECONDS = int(os.getenv("JOB_HEARTBEAT_STALE_SECONDS", "180"))  # started job without a heartbeat this long is lost
+MAX_JOB_RECOVERIES = int(os.getenv("MAX_JOB_RECOVERIES", "2"))  # re-enqueues before a stuck file is failed
+REAPER_INTERVAL = int(os.getenv("REAPER_INTERVAL", "300"))  # seconds between stale job checks
+
+# Stats Configuration
+STATS_HOURS_RETAINED = int(os.getenv("STATS_HOURS_RETAINED", "168"))  # hourly buckets kept in Redis (7 days)
+STATS_RECONCILE_INTERVAL = int(os.getenv("STATS_RECONCILE_INTERVAL", "600"))  # seconds between recounts from Mongo
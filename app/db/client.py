@@ -1,3 +1,4 @@
+from typing import Optional
 from pymongo import AsyncMongoClient
 from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
 import logging
@@ -7,6 +8,8 @@ from ..config import MONGO_URI
 
 logger = logging.getLogger(__name__)
 
+_mongo_client: Optional[AsyncMongoClient] = None
+
 def create_mongo_client() -> AsyncMongoClient:
     """Create and return MongoDB client with error handling"""
     try:
@@ -20,14 +23,26 @@ def create_mongo_client() -> AsyncMongoClient:
         logger.error(f"Failed to create MongoDB client: {e}")
         raise
 
-mongo_client: AsyncMongoClient = create_mongo_client()
+def get_mongo_client() -> AsyncMongoClient:
+    """Return the shared MongoDB client, creating it on first use"""
+    global _mongo_client
+    if _mongo_client is None:
+        _mongo_client = create_mongo_client()
+    return _mongo_client
+
+async def close_mongo_client():
+    """Close the shared MongoDB client if it was created"""
+    global _mongo_client
+    if _mongo_client is not None:
+        await _mongo_client.close()
+        _mongo_client = None
 
 async def test_connection():
     """Test MongoDB connection"""
     try:
-        await mongo_client.admin.command('ping')
+        await get_mongo_client().admin.command('ping')
         logger.info("MongoDB connection successful")
         return True
     except (ConnectionFailure, ServerSelectionTimeoutError) as e:
         logger.error(f"MongoDB connection failed: {e}")
-        return False
\ No newline at end of file
+        return False
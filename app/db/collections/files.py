@@ -1,30 +1,50 @@
 from pydantic import Field, BaseModel
-from typing import Optional, List
+from typing import Optional, List, Any
 from datetime import datetime
 from pymongo.asynchronous.collection import AsyncCollection
 
 # custom imports
-from ..db import database
-from ...config import COLLECTION_NAME
+from ..db import get_database
+from ..indexes import ensure_ttl_index
+from ...config import COLLECTION_NAME, FILE_TTL_SECONDS, FILE_TTL_FIELD
+
+# File statuses that mean work is still outstanding
+ACTIVE_STATUSES = ["saving", "queued", "processing", "converting_to_image_success"]
 
 class FileSchema(BaseModel):
     name: str = Field(..., description="Name of the file")
     status: str = Field(..., description="Status of the file processing")
     file_path: Optional[str] = Field(None, description="Path to the uploaded file")
-    result: Optional[str] = Field(None, description="Result of the file processing")
+    result: Optional[str] = Field(None, description="Result of the file processing, inline when small")
+    result_zstd: Optional[bytes] = Field(None, description="zstd-compressed result, when stored inline compressed")
+    result_gridfs_id: Optional[Any] = Field(None, description="GridFS id of the compressed result, when offloaded")
+    result_encoding: Optional[str] = Field(None, description="None for inline text, 'zstd' or 'zstd+gridfs' when compressed")
+    result_hash: Optional[str] = Field(None, description="SHA-256 of the result text, used for ETags")
+    result_size: Optional[int] = Field(None, description="Size of the uncompressed result in bytes")
     error: Optional[str] = Field(None, description="Error message if processing failed")
     created_at: datetime = Field(default_factory=datetime.utcnow, description="File creation timestamp")
     updated_at: datetime = Field(default_factory=datetime.utcnow, description="Last update timestamp")
     image_paths: Optional[List[str]] = Field(None, description="Paths to converted images")
     file_size: Optional[int] = Field(None, description="File size in bytes")
+    page_count: Optional[int] = Field(None, description="Number of pages reported by pdfinfo")
+    tier: Optional[str] = Field(None, description="Processing tier used for page and time budgets")
+    recovery_attempts: int = Field(0, description="Times the stale job reaper re-enqueued this file")
 
-files_collection: AsyncCollection = database[COLLECTION_NAME]
+def get_files_collection() -> AsyncCollection:
+    """Return the files collection on the shared client"""
+    return get_database()[COLLECTION_NAME]
 
 async def create_file_indexes():
     """Create indexes for better query performance"""
+    files_collection = get_files_collection()
     try:
         await files_collection.create_index("status")
-        await files_collection.create_index("created_at")
         await files_collection.create_index("name")
+        await files_collection.create_index([("status", 1), ("updated_at", 1)])
+        
+        # Records expire FILE_TTL_SECONDS after creation or last update; the
+        # other field's TTL is cleared so switching FILE_TTL_FIELD takes effect
+        for field in ("created_at", "updated_at"):
+            await ensure_ttl_index(files_collection, field, FILE_TTL_SECONDS if FILE_TTL_FIELD == field else 0)
     except Exception as e:
         print(f"Failed to create indexes: {e}")
\ No newline at end of file
@@ -0,0 +1,34 @@
+import logging
+from pydantic import Field, BaseModel
+from typing import Optional
+from datetime import datetime
+from pymongo.asynchronous.collection import AsyncCollection
+
+# custom imports
+from ..db import get_database
+from ..indexes import ensure_ttl_index
+from ...config import PAGES_COLLECTION_NAME, FILE_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+class PageResultSchema(BaseModel):
+    file_id: str = Field(..., description="ID of the file the page belongs to")
+    page: int = Field(..., description="1-based page number")
+    result: Optional[str] = Field(None, description="AI output for this page")
+    created_at: datetime = Field(default_factory=datetime.utcnow, description="Page result creation timestamp")
+
+def get_pages_collection() -> AsyncCollection:
+    """Return the per-page results collection on the shared client"""
+    return get_database()[PAGES_COLLECTION_NAME]
+
+async def create_page_indexes():
+    """Create indexes for better query performance"""
+    pages_collection = get_pages_collection()
+    try:
+        await pages_collection.create_index([("file_id", 1), ("page", 1)], unique=True)
+        # Page results expire alongside their file records
+        await ensure_ttl_index(pages_collection, "created_at", FILE_TTL_SECONDS)
+    except Exception as e:
+        # The unique index is what makes page upserts idempotent, so don't carry on without it
+        logger.error("Failed to create page indexes: %s", e)
+        raise
@@ -1,4 +1,8 @@
-from .client import mongo_client
+from pymongo.asynchronous.database import AsyncDatabase
+
+from .client import get_mongo_client
 from ..config import DATABASE_NAME
 
-database = mongo_client[DATABASE_NAME]
\ No newline at end of file
+def get_database() -> AsyncDatabase:
+    """Return the application database on the shared client"""
+    return get_mongo_client()[DATABASE_NAME]
\ No newline at end of file
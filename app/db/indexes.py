@@ -0,0 +1,38 @@
+import logging
+
+from pymongo.asynchronous.collection import AsyncCollection
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+async def ensure_ttl_index(collection: AsyncCollection, field: str, expire_after_seconds: int):
+    """Create or retune a TTL index on a date field; 0 removes the expiry"""
+    existing = None
+    async for index in await collection.list_indexes():
+        if list(index["key"].items()) == [(field, 1)]:
+            existing = index
+            break
+
+    if expire_after_seconds <= 0:
+        # Drop only the expiry, keep the field indexed for sorting and range queries
+        if existing is not None and "expireAfterSeconds" in existing:
+            await collection.drop_index(existing["name"])
+            await collection.create_index(field)
+            logger.info("Removed TTL on %s.%s", collection.name, field)
+        elif existing is None:
+            await collection.create_index(field)
+        return
+
+    if existing is None:
+        await collection.create_index(field, expireAfterSeconds=expire_after_seconds)
+    elif existing.get("expireAfterSeconds") != expire_after_seconds:
+        try:
+            # collMod converts a plain index or changes the TTL in place
+            await collection.database.command(
+                "collMod", collection.name,
+                index={"keyPattern": {field: 1}, "expireAfterSeconds": expire_after_seconds}
+            )
+        except OperationFailure:
+            await collection.drop_index(existing["name"])
+            await collection.create_index(field, expireAfterSeconds=expire_after_seconds)
+    logger.info("TTL on %s.%s set to %d seconds", collection.name, field, expire_after_seconds)
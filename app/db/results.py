@@ -0,0 +1,109 @@
+import hashlib
+import logging
+from typing import Optional, Dict, Any
+
+import zstandard
+from bson import Binary, ObjectId
+from gridfs import AsyncGridFSBucket
+
+# custom imports
+from .db import get_database
+from ..config import (
+    RESULT_COMPRESS_THRESHOLD, RESULT_INLINE_MAX_BYTES, RESULT_ZSTD_LEVEL, RESULTS_BUCKET_NAME
+)
+
+logger = logging.getLogger(__name__)
+
+# Values of the `result_encoding` field on a file document
+ENCODING_ZSTD = "zstd"
+ENCODING_ZSTD_GRIDFS = "zstd+gridfs"
+
+# Fields holding an inline result, left out of reads that only need the ETag
+RESULT_BODY_FIELDS = ("result", "result_zstd")
+
+def get_results_bucket() -> AsyncGridFSBucket:
+    """Return the GridFS bucket holding offloaded results"""
+    return AsyncGridFSBucket(get_database(), bucket_name=RESULTS_BUCKET_NAME)
+
+def hash_result(result: str) -> str:
+    """Content hash of a result, used for ETags without loading the result"""
+    return hashlib.sha256(result.encode("utf-8")).hexdigest()
+
+async def encode_result(file_id: str, result: str) -> Dict[str, Any]:
+    """Build the `$set` fields storing a result inline, compressed, or in GridFS"""
+    raw = result.encode("utf-8")
+    fields: Dict[str, Any] = {
+        "result": None,
+        "result_zstd": None,
+        "result_gridfs_id": None,
+        "result_encoding": None,
+        "result_hash": hash_result(result),
+        "result_size": len(raw),
+    }
+
+    if len(raw) < RESULT_COMPRESS_THRESHOLD:
+        fields["result"] = result
+        return fields
+
+    compressed = zstandard.ZstdCompressor(level=RESULT_ZSTD_LEVEL).compress(raw)
+
+    if len(compressed) <= RESULT_INLINE_MAX_BYTES:
+        fields["result_zstd"] = Binary(compressed)
+        fields["result_encoding"] = ENCODING_ZSTD
+        return fields
+
+    gridfs_id = await get_results_bucket().upload_from_stream(
+        file_id, compressed, metadata={"file_id": file_id, "encoding": ENCODING_ZSTD}
+    )
+    fields["result_gridfs_id"] = gridfs_id
+    fields["result_encoding"] = ENCODING_ZSTD_GRIDFS
+    return fields
+
+def has_inline_result(db_file: Dict[str, Any]) -> bool:
+    """Whether a file's result lives in RESULT_BODY_FIELDS rather than GridFS"""
+    return db_file.get("result_encoding") != ENCODING_ZSTD_GRIDFS
+
+async def load_result(db_file: Dict[str, Any]) -> Optional[str]:
+    """Return a file's result as text, whichever way it was stored"""
+    encoding = db_file.get("result_encoding")
+
+    if encoding == ENCODING_ZSTD:
+        compressed = bytes(db_file["result_zstd"])
+    elif encoding == ENCODING_ZSTD_GRIDFS:
+        stream = await get_results_bucket().open_download_stream(db_file["result_gridfs_id"])
+        compressed = await stream.read()
+    else:
+        return db_file.get("result")
+
+    return zstandard.ZstdDecompressor().decompress(compressed).decode("utf-8")
+
+async def delete_result_blob(db_file: Dict[str, Any]) -> bool:
+    """Remove a file's offloaded result from GridFS, if it has one"""
+    gridfs_id: Optional[ObjectId] = db_file.get("result_gridfs_id")
+    if not gridfs_id:
+        return True
+    try:
+        await get_results_bucket().delete(gridfs_id)
+        return True
+    except Exception as e:
+        logger.error("Failed to delete result blob %s: %s", gridfs_id, e)
+        return False
+
+def file_etag(db_file: Dict[str, Any]) -> str:
+    """ETag for a file's API representation, computed without loading the result"""
+    result_hash = db_file.get("result_hash")
+    if result_hash is None and db_file.get("result"):
+        result_hash = hash_result(db_file["result"])
+
+    parts = [
+        str(db_file.get("_id")),
+        str(db_file.get("name")),
+        str(db_file.get("status")),
+        str(db_file.get("updated_at")),
+        str(db_file.get("error")),
+        str(db_file.get("page_count")),
+        str(db_file.get("file_size")),
+        str(db_file.get("image_paths")),
+        str(result_hash),
+    ]
+    return '"' + hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()[:32] + '"'
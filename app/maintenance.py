@@ -0,0 +1,45 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Any
+
+from .utils.cleanup import sweep_orphaned_artifacts
+from .queue.reaper import reap_stale_jobs
+from .utils.stats import reconcile_status_counts
+from .db.client import close_mongo_client
+from .config import SWEEP_INTERVAL, REAPER_INTERVAL, STATS_RECONCILE_INTERVAL
+from .utils.logger import setup_logging
+
+logger = logging.getLogger(__name__)
+
+async def run_periodically(name: str, interval: int, task: Callable[[], Awaitable[Any]]):
+    """Run a maintenance task every interval seconds, surviving failures"""
+    while True:
+        try:
+            result = await task()
+            logger.info("Maintenance task %s finished: %s", name, result)
+        except Exception as e:
+            logger.error("Maintenance task %s failed: %s", name, e)
+        await asyncio.sleep(interval)
+
+async def run():
+    """Run all periodic maintenance tasks"""
+    try:
+        await asyncio.gather(
+            run_periodically("sweep_orphaned_artifacts", SWEEP_INTERVAL, sweep_orphaned_artifacts),
+            run_periodically("reap_stale_jobs", REAPER_INTERVAL, reap_stale_jobs),
+            run_periodically("reconcile_status_counts", STATS_RECONCILE_INTERVAL, reconcile_status_counts),
+        )
+    finally:
+        await close_mongo_client()
+
+def main():
+    """Maintenance entry point"""
+    setup_logging()
+    logger.info("Starting maintenance tasks")
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        logger.info("Maintenance stopped by user")
+
+if __name__ == "__main__":
+    main()
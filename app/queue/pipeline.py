@@ -0,0 +1,236 @@
+import asyncio
+import logging
+import threading
+import time
+import traceback
+from typing import Dict, List, Optional
+
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+from rq import Queue, SimpleWorker
+from rq.exceptions import DequeueTimeout
+from rq.executions import Execution
+from rq.job import Job
+from rq.utils import now
+
+# custom imports
+from .workers import claim_file, render_file, analyze_file, fail_unexpectedly, remove_image_dir
+from ..config import WORKER_RENDER_AHEAD, WORKER_DEQUEUE_TIMEOUT
+from ..utils.logger import log_context
+
+logger = logging.getLogger(__name__)
+
+# Transient Redis failures the worker waits out instead of exiting
+REDIS_ERRORS = (RedisConnectionError, RedisTimeoutError)
+REDIS_RETRY_MAX_DELAY = 30
+
+class RenderedJob:
+    """A dequeued job whose pages are already rendered (or failed to render)"""
+
+    def __init__(
+        self,
+        job: Job,
+        queue: Queue,
+        execution: Execution,
+        image_paths: Optional[List[str]] = None,
+        error: Optional[str] = None,
+        budget: Optional[float] = None
+    ):
+        self.job = job
+        self.queue = queue
+        self.execution = execution
+        self.image_paths = image_paths
+        self.error = error
+        # Seconds of the job timeout left for the analyze stage
+        self.budget = budget
+
+class PipelinedWorker:
+    """Worker that renders upcoming jobs while the current job awaits the model"""
+
+    def __init__(self, queue: Queue, render_ahead: int = WORKER_RENDER_AHEAD):
+        self.queue = queue
+        # RQ bookkeeping (started/finished/failed registries) goes through a
+        # SimpleWorker so jobs look the same as with the forking worker
+        self.worker = SimpleWorker([queue], connection=queue.connection)
+        # Jobs are only taken from RQ when a slot is free, so at most
+        # render_ahead jobs wait here and the rest stay with other workers
+        self.slots = asyncio.Semaphore(max(1, render_ahead))
+        self.rendered: asyncio.Queue = asyncio.Queue()
+        # Every job taken from RQ and not finished yet, heartbeated together
+        self.held: Dict[str, tuple[Job, Execution]] = {}
+        # The SimpleWorker holds one current execution, so its bookkeeping
+        # calls must not interleave across threads
+        self.bookkeeping = threading.Lock()
+        self.stopping = False
+
+    async def run(self):
+        """Run the render and analyze stages until stopped"""
+        self.worker.register_birth()
+        logger.info("Pipelined worker %s started for queue %s", self.worker.name, self.queue.name)
+        heartbeats = asyncio.create_task(self.heartbeat_loop())
+        try:
+            await asyncio.gather(self.render_loop(), self.analyze_loop())
+        finally:
+            heartbeats.cancel()
+            self.worker.register_death()
+
+    def stop(self):
+        """Stop taking new jobs; jobs already taken are finished first"""
+        self.stopping = True
+
+    def heartbeat_ttl(self) -> int:
+        """Seconds a heartbeat keeps the worker and its held jobs alive"""
+        return self.worker.job_monitoring_interval + 60
+
+    def send_heartbeats(self, held: List[tuple[Job, Execution]]):
+        """Extend the worker, execution and job heartbeats of every held job (blocking)"""
+        ttl = self.heartbeat_ttl()
+        with self.worker.connection.pipeline() as pipeline:
+            self.worker.heartbeat(ttl, pipeline=pipeline)
+            for job, execution in held:
+                execution.heartbeat(job.started_job_registry, ttl, pipeline=pipeline)
+                job.heartbeat(now(), ttl, pipeline=pipeline, xx=True)
+            pipeline.execute()
+
+    async def heartbeat_loop(self):
+        """Keep held jobs alive in RQ's registries while they wait or run"""
+        while True:
+            await asyncio.sleep(self.worker.job_monitoring_interval)
+            try:
+                await asyncio.to_thread(self.send_heartbeats, list(self.held.values()))
+            except Exception as e:
+                # Dying here would make every held job look abandoned to the reaper
+                logger.warning("Failed to send worker heartbeats: %s", e)
+
+    async def take_job(self) -> Optional[tuple[Job, Queue, Execution]]:
+        """Dequeue a job and mark it started, None on dequeue timeout (blocking calls run in a thread)"""
+        try:
+            dequeued = await asyncio.to_thread(
+                Queue.dequeue_any, [self.queue], WORKER_DEQUEUE_TIMEOUT, connection=self.queue.connection
+            )
+        except DequeueTimeout:
+            return None
+        if dequeued is None:
+            return None
+
+        job, queue = dequeued
+
+        def prepare() -> Execution:
+            # Same steps as Worker.execute_job/perform_job: an execution in the
+            # started registry, then the job leaves the intermediate queue
+            with self.bookkeeping:
+                execution = self.worker.prepare_execution(job)
+                self.worker.prepare_job_execution(job, remove_from_intermediate_queue=True)
+                return execution
+
+        execution = await asyncio.to_thread(prepare)
+        self.held[job.id] = (job, execution)
+        return job, queue, execution
+
+    async def render_loop(self):
+        """Render stage: take the next job as soon as a slot frees up and render it"""
+        retry_delay = 1
+        while not self.stopping:
+            await self.slots.acquire()
+            if self.stopping:
+                self.slots.release()
+                break
+
+            try:
+                taken = await self.take_job()
+                retry_delay = 1
+            except REDIS_ERRORS as e:
+                # A job moved to the intermediate queue but never prepared is
+                # failed by RQ's cleanup and then recovered by the reaper
+                logger.warning("Redis unavailable while taking a job, retrying in %ds: %s", retry_delay, e)
+                self.slots.release()
+                await asyncio.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, REDIS_RETRY_MAX_DELAY)
+                continue
+
+            if taken is None:
+                self.slots.release()
+                continue
+
+            job, queue, execution = taken
+            file_id, file_path = job.args[:2]
+            with log_context(file_id=file_id):
+                logger.info("Rendering ahead for file %s", file_id)
+                started = time.monotonic()
+                try:
+                    if not await claim_file(file_id):
+                        await self.rendered.put(RenderedJob(job, queue, execution))
+                        continue
+
+                    # Rendering counts against the job timeout, like in process_file;
+                    # pdf2image kills poppler itself, cancelling the thread would not
+                    image_paths = await render_file(file_id, file_path, job.kwargs.get("max_pages"), job.timeout)
+                    budget = max(1, job.timeout - (time.monotonic() - started)) if job.timeout else None
+                    await self.rendered.put(RenderedJob(job, queue, execution, image_paths, budget=budget))
+                except Exception as e:
+                    await fail_unexpectedly(file_id, e)
+                    await self.rendered.put(RenderedJob(job, queue, execution, error=traceback.format_exc()))
+
+        # Tell the analyze stage no more jobs are coming
+        await self.rendered.put(None)
+
+    async def analyze_loop(self):
+        """AI stage: analyze rendered jobs one at a time, in dequeue order"""
+        while True:
+            rendered = await self.rendered.get()
+            if rendered is None:
+                return
+            self.slots.release()
+
+            job = rendered.job
+            file_id, file_path = job.args[:2]
+            with log_context(file_id=file_id):
+                if rendered.error is not None:
+                    await self.finish_job(rendered, error=rendered.error)
+                    continue
+
+                # Render failures (already recorded on the file) and skipped duplicates, like process_file
+                if rendered.image_paths is None:
+                    await self.finish_job(rendered, result=False)
+                    continue
+
+                try:
+                    result = await asyncio.wait_for(
+                        analyze_file(file_id, file_path, rendered.image_paths),
+                        timeout=rendered.budget
+                    )
+                    await self.finish_job(rendered, result=result)
+                except asyncio.TimeoutError:
+                    error = TimeoutError(f"Analysis exceeded the {job.timeout}s job timeout")
+                    await fail_unexpectedly(file_id, error)
+                    # analyze_file only cleans up after success
+                    await remove_image_dir(file_id)
+                    await self.finish_job(rendered, error=str(error))
+                except Exception as e:
+                    await fail_unexpectedly(file_id, e)
+                    await self.finish_job(rendered, error=traceback.format_exc())
+
+    def record_outcome(self, rendered: RenderedJob, result: bool, error: Optional[str]):
+        """Record the job outcome in RQ's registries (blocking)"""
+        job, queue = rendered.job, rendered.queue
+        job.ended_at = now()
+        with self.bookkeeping:
+            # Point the SimpleWorker at this job's execution so cleanup_execution
+            # removes the right one from the started registry
+            self.worker.execution = rendered.execution
+            if error is None:
+                job._result = result
+                self.worker.handle_job_success(job=job, queue=queue, started_job_registry=queue.started_job_registry)
+            else:
+                self.worker.handle_job_failure(
+                    job=job, queue=queue, started_job_registry=queue.started_job_registry, exc_string=error
+                )
+
+    async def finish_job(self, rendered: RenderedJob, result: bool = False, error: Optional[str] = None):
+        """Record the job outcome and stop heartbeating it"""
+        self.held.pop(rendered.job.id, None)
+        try:
+            await asyncio.to_thread(self.record_outcome, rendered, result, error)
+        except REDIS_ERRORS as e:
+            # The file record already holds the outcome; RQ moves the job to
+            # the failed registry once its started registry entry expires
+            logger.error("Failed to record outcome of job %s in RQ: %s", rendered.job.id, e)
@@ -1,12 +1,21 @@
+from typing import Optional, Dict, Any
 from redis import Redis
 from rq import Queue
+from rq.job import Job
 import logging
 
 # custom imports
 from ..config import REDIS_HOST, REDIS_PORT, REDIS_PASSWORD, REDIS_USERNAME
+from ..utils.limits import compute_job_timeout
 
 logger = logging.getLogger(__name__)
 
+# Referenced by import path so the API never imports the worker module
+PROCESS_FILE_JOB = "app.queue.workers.process_file"
+
+_redis_client: Optional[Redis] = None
+_queue: Optional[Queue] = None
+
 def create_redis_client() -> Redis:
     """Create Redis client with error handling"""
     try:
@@ -34,13 +43,49 @@ def create_queue() -> Queue:
         logger.error(f"Failed to create queue: {e}")
         raise
 
-redis_client = create_redis_client()
-queue = create_queue()
+def get_redis_client() -> Redis:
+    """Return the shared Redis client, creating it on first use"""
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = create_redis_client()
+    return _redis_client
+
+def get_queue() -> Queue:
+    """Return the shared RQ queue, creating it on first use"""
+    global _queue
+    if _queue is None:
+        _queue = create_queue()
+    return _queue
+
+def close_redis_clients():
+    """Close the shared Redis connections if they were created"""
+    global _redis_client, _queue
+    if _redis_client is not None:
+        _redis_client.close()
+        _redis_client = None
+    if _queue is not None:
+        _queue.connection.close()
+        _queue = None
+
+def enqueue_file_job(file_id: str, file_path: str, page_count: Optional[int], limits: Dict[str, Any]) -> Job:
+    """Enqueue processing for a file, bounded by its tier's page and time budget"""
+    return get_queue().enqueue(
+        PROCESS_FILE_JOB,
+        file_id,
+        file_path,
+        max_pages=limits["max_pages"],
+        job_id=file_id,
+        job_timeout=compute_job_timeout(page_count, limits)
+    )
+
+def get_queue_backlog() -> int:
+    """Number of jobs waiting in the processing queue"""
+    return get_queue().count
 
 async def test_redis_connection() -> bool:
     """Test Redis connection"""
     try:
-        redis_client.ping()
+        get_redis_client().ping()
         logger.info("Redis connection successful")
         return True
     except Exception as e:
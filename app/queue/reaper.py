@@ -0,0 +1,155 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional, Dict, Any, Set
+
+from rq import Queue
+from rq.job import Job, JobStatus
+from rq.utils import now
+
+# custom imports
+from .queue import get_queue, get_redis_client, enqueue_file_job
+from ..db.collections.files import get_files_collection, ACTIVE_STATUSES
+from ..utils.limits import get_tier_limits
+from ..utils.logger import log_context
+from ..utils.stats import record_status_change, REAPER_STATS_KEY
+from ..config import STALE_JOB_SECONDS, MAX_JOB_RECOVERIES, CLEANUP_BATCH_SIZE, JOB_HEARTBEAT_STALE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# RQ job statuses that mean the job will still run; STARTED jobs are checked separately
+WAITING_JOB_STATUSES = {JobStatus.QUEUED, JobStatus.DEFERRED, JobStatus.SCHEDULED}
+
+def is_job_live(job: Optional[Job], started_job_ids: Set[str]) -> bool:
+    """Whether a job is waiting to run or running on a worker that is still alive"""
+    if job is None:
+        return False
+
+    status = job.get_status(refresh=False)
+    if status in WAITING_JOB_STATUSES:
+        return True
+    if status != JobStatus.STARTED:
+        return False
+
+    # A crashed worker leaves the status at STARTED; only a registry entry
+    # or a recent heartbeat shows someone is still working on it
+    if job.id in started_job_ids:
+        return True
+    cutoff = now() - timedelta(seconds=JOB_HEARTBEAT_STALE_SECONDS)
+    return job.last_heartbeat is not None and job.last_heartbeat >= cutoff
+
+async def fail_stale_file(db_file: Dict[str, Any], error: str) -> bool:
+    """Mark a stale file failed, unless it changed since it was read"""
+    result = await get_files_collection().update_one(
+        {"_id": db_file["_id"], "status": db_file["status"], "updated_at": db_file.get("updated_at")},
+        {"$set": {"status": "failed", "error": error, "updated_at": datetime.utcnow()}}
+    )
+    if result.modified_count == 0:
+        return False
+    record_status_change(db_file["status"], "failed")
+    return True
+
+async def recover_file(db_file: Dict[str, Any], job: Optional[Job], queue: Queue) -> str:
+    """Re-enqueue or fail a file whose job is gone; returns the outcome"""
+    file_id = str(db_file["_id"])
+    file_path = db_file.get("file_path")
+    attempts = db_file.get("recovery_attempts", 0)
+
+    if not file_path:
+        failed = await fail_stale_file(db_file, "Upload did not complete")
+        return "failed" if failed else "skipped"
+
+    if attempts >= MAX_JOB_RECOVERIES:
+        failed = await fail_stale_file(db_file, f"Processing job was lost {attempts + 1} times, giving up")
+        return "failed" if failed else "skipped"
+
+    # Idempotency guard: only the run that sees the exact stale state may re-enqueue
+    result = await get_files_collection().update_one(
+        {"_id": db_file["_id"], "status": db_file["status"], "updated_at": db_file.get("updated_at")},
+        {
+            "$set": {"status": "queued", "updated_at": datetime.utcnow()},
+            "$inc": {"recovery_attempts": 1}
+        }
+    )
+    if result.modified_count == 0:
+        return "skipped"
+    record_status_change(db_file["status"], "queued")
+
+    try:
+        # Clear the dead job from RQ's registries before reusing its id
+        if job is not None:
+            await asyncio.to_thread(job.delete)
+
+        limits = get_tier_limits(db_file.get("tier")) or get_tier_limits()
+        await asyncio.to_thread(enqueue_file_job, file_id, file_path, db_file.get("page_count"), limits)
+        logger.info("Re-enqueued stale file %s (attempt %d)", file_id, attempts + 1)
+        return "requeued"
+    except Exception as e:
+        logger.error("Failed to re-enqueue stale file %s: %s", file_id, e)
+        await get_files_collection().update_one(
+            {"_id": db_file["_id"]},
+            {"$set": {"status": "failed", "error": f"Failed to re-enqueue lost job: {e}", "updated_at": datetime.utcnow()}}
+        )
+        record_status_change("queued", "failed")
+        return "failed"
+
+async def reconcile_batch(db_files: List[Dict[str, Any]], queue: Queue, counts: Dict[str, int]):
+    """Compare a batch of stale files with their RQ jobs and recover lost ones"""
+    if not db_files:
+        return
+
+    jobs = await asyncio.to_thread(
+        Job.fetch_many, [str(db_file["_id"]) for db_file in db_files], connection=queue.connection
+    )
+    started_job_ids = set(await asyncio.to_thread(queue.started_job_registry.get_job_ids, cleanup=False))
+
+    for db_file, job in zip(db_files, jobs):
+        counts["checked"] += 1
+        if is_job_live(job, started_job_ids):
+            counts["live"] += 1
+            continue
+
+        with log_context(file_id=str(db_file["_id"])):
+            counts[await recover_file(db_file, job, queue)] += 1
+
+async def reap_stale_jobs(
+    stale_seconds: int = STALE_JOB_SECONDS,
+    batch_size: int = CLEANUP_BATCH_SIZE
+) -> Dict[str, int]:
+    """Find files stuck in a non-terminal status and re-enqueue or fail them"""
+    counts = {"checked": 0, "live": 0, "requeued": 0, "failed": 0, "skipped": 0}
+    queue = get_queue()
+
+    # Moves jobs of dead workers from the started to the failed registry
+    await asyncio.to_thread(queue.started_job_registry.cleanup)
+
+    cutoff = datetime.utcnow() - timedelta(seconds=stale_seconds)
+    cursor = get_files_collection().find(
+        {
+            "status": {"$in": ACTIVE_STATUSES},
+            # Records written before updated_at was a real date hold a string
+            "$or": [{"updated_at": {"$lt": cutoff}}, {"updated_at": {"$type": "string"}}]
+        },
+        {"status": 1, "updated_at": 1, "file_path": 1, "page_count": 1, "tier": 1, "recovery_attempts": 1}
+    ).batch_size(batch_size)
+
+    batch: List[Dict[str, Any]] = []
+    async for db_file in cursor:
+        batch.append(db_file)
+        if len(batch) >= batch_size:
+            await reconcile_batch(batch, queue, counts)
+            batch = []
+    await reconcile_batch(batch, queue, counts)
+
+    try:
+        recovered = {key: counts[key] for key in ("requeued", "failed") if counts[key]}
+        for key, value in recovered.items():
+            get_redis_client().hincrby(REAPER_STATS_KEY, key, value)
+    except Exception as e:
+        logger.warning("Failed to record reaper counts: %s", e)
+
+    logger.info(
+        "Stale job reaper checked %d files: %d live, %d requeued, %d failed, %d skipped",
+        counts["checked"], counts["live"], counts["requeued"], counts["failed"], counts["skipped"]
+    )
+    return counts
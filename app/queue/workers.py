@@ -1,16 +1,26 @@
 import os
+import shutil
+import asyncio
 import logging
 from typing import List, Optional
+from datetime import datetime
 from bson import ObjectId
+from pymongo import UpdateOne, ReturnDocument
 from pdf2image import convert_from_path
-from pdf2image.exceptions import PDFPageCountError, PDFSyntaxError
+from pdf2image.exceptions import PDFPageCountError, PDFSyntaxError, PDFPopplerTimeoutError
 
 # custom imports
-from ..db.collections.files import files_collection
-from ..utils.ai_call import process_multiple_images_with_ai, combine_ai_results
+from ..db.collections.files import get_files_collection
+from ..db.collections.pages import get_pages_collection, PageResultSchema
+from ..db.results import encode_result, delete_result_blob
+from ..utils.ai_call import process_multiple_images_with_ai, reduce_ai_results
 from ..utils.file import generate_image_paths, cleanup_files, get_file_size
 from ..config import IMAGE_DIR
+from ..utils.logger import log_context, setup_logging, shutdown_logging
+from ..utils.stats import record_status_change, record_pages_processed
 
+# Configure logging for worker processes
+setup_logging()
 logger = logging.getLogger(__name__)
 
 async def update_file_status(file_id: str, status: str, error: Optional[str] = None) -> bool:
@@ -18,78 +28,134 @@ async def update_file_status(file_id: str, status: str, error: Optional[str] = N
     try:
         update_data = {
             "status": status,
-            "updated_at": "$$NOW"
+            "updated_at": datetime.utcnow()
         }
         if error:
             update_data["error"] = error
             
-        await files_collection.update_one(
+        previous = await get_files_collection().find_one_and_update(
             {"_id": ObjectId(file_id)},
-            {"$set": update_data}
+            {"$set": update_data},
+            projection={"status": 1},
+            return_document=ReturnDocument.BEFORE
         )
-        logger.info(f"Updated file {file_id} status to: {status}")
+        if previous:
+            record_status_change(previous.get("status"), status)
+        logger.info("Updated file %s status to: %s", file_id, status)
         return True
     except Exception as e:
-        logger.error(f"Failed to update file {file_id} status: {e}")
+        logger.error("Failed to update file %s status: %s", file_id, e)
         return False
 
-async def convert_pdf_to_images(file_path: str, file_id: str) -> tuple[bool, Optional[List[str]], Optional[str]]:
-    """Convert PDF to images with error handling"""
+async def claim_file(file_id: str) -> bool:
+    """Atomically move a queued file to processing; False if another run owns it"""
+    result = await get_files_collection().update_one(
+        {"_id": ObjectId(file_id), "status": "queued"},
+        {"$set": {"status": "processing", "updated_at": datetime.utcnow()}}
+    )
+    if result.modified_count == 0:
+        logger.warning("File %s is not queued, skipping duplicate or stale job", file_id)
+        return False
+    record_status_change("queued", "processing")
+    return True
+
+def render_pages(
+    file_path: str,
+    image_dir: str,
+    max_pages: Optional[int] = None,
+    timeout: Optional[int] = None
+) -> List[str]:
+    """Render PDF pages to JPEG files (blocking); poppler is killed after timeout seconds"""
+    images = convert_from_path(file_path, dpi=200, fmt='JPEG', last_page=max_pages, timeout=timeout)
+    
+    image_paths = []
+    for i, page in enumerate(images):
+        image_path = os.path.join(image_dir, f"page-{i+1}.jpg")
+        page.save(image_path, "JPEG", quality=85)
+        image_paths.append(image_path)
+    return image_paths
+
+async def remove_image_dir(file_id: str) -> None:
+    """Remove a file's rendered pages from disk"""
+    await asyncio.to_thread(shutil.rmtree, os.path.join(IMAGE_DIR, file_id), ignore_errors=True)
+
+async def convert_pdf_to_images(
+    file_path: str,
+    file_id: str,
+    max_pages: Optional[int] = None,
+    timeout: Optional[int] = None
+) -> tuple[bool, Optional[List[str]], Optional[str]]:
+    """Convert PDF to images with error handling, rendering at most max_pages pages"""
     try:
         # Create image directory
         image_dir = os.path.join(IMAGE_DIR, file_id)
         os.makedirs(image_dir, exist_ok=True)
         
-        # Convert PDF to images
-        images = convert_from_path(file_path, dpi=200, fmt='JPEG')
+        # Convert and save in a thread so the event loop stays free for AI calls
+        image_paths = await asyncio.to_thread(render_pages, file_path, image_dir, max_pages, timeout)
         
-        if not images:
+        if not image_paths:
             return False, None, "No pages found in PDF"
         
-        # Save images
-        image_paths = []
-        for i, page in enumerate(images):
-            image_path = os.path.join(image_dir, f"page-{i+1}.jpg")
-            page.save(image_path, "JPEG", quality=85)
-            image_paths.append(image_path)
-        
-        logger.info(f"Successfully converted PDF to {len(image_paths)} images")
+        logger.info("Successfully converted PDF to %d images", len(image_paths))
         return True, image_paths, None
         
+    except PDFPopplerTimeoutError:
+        logger.error("PDF rendering exceeded %ss", timeout)
+        await remove_image_dir(file_id)
+        return False, None, f"PDF rendering exceeded the {timeout}s time budget"
     except PDFPageCountError as e:
+        logger.error("PDF page count error: %s", e)
         error_msg = f"PDF page count error: {e}"
-        logger.error(error_msg)
         return False, None, error_msg
     except PDFSyntaxError as e:
+        logger.error("PDF syntax error: %s", e)
         error_msg = f"PDF syntax error: {e}"
-        logger.error(error_msg)
         return False, None, error_msg
     except Exception as e:
+        logger.error("Failed to convert PDF to images: %s", e)
         error_msg = f"Failed to convert PDF to images: {e}"
-        logger.error(error_msg)
         return False, None, error_msg
 
-async def process_images_with_ai(image_paths: List[str]) -> tuple[bool, Optional[str], Optional[str]]:
-    """Process images with AI"""
+async def process_images_with_ai(image_paths: List[str]) -> tuple[bool, Optional[str], Optional[List[Optional[str]]], Optional[str]]:
+    """Process images with AI, returning the reduced result and the per-page outputs"""
     try:
         # Process all images
         results = await process_multiple_images_with_ai(image_paths)
         
-        # Combine results
-        combined_result = combine_ai_results(results)
+        # Reduce page outputs into a bounded combined result
+        combined_result = await reduce_ai_results(results)
         
         if combined_result and combined_result != "No valid results from AI processing":
             logger.info("AI processing completed successfully")
-            return True, combined_result, None
+            return True, combined_result, results, None
         else:
             error_msg = "AI processing failed to generate valid results"
             logger.error(error_msg)
-            return False, None, error_msg
+            return False, None, None, error_msg
             
     except Exception as e:
+        logger.error("AI processing failed: %s", e)
         error_msg = f"AI processing failed: {e}"
-        logger.error(error_msg)
-        return False, None, error_msg
+        return False, None, None, error_msg
+
+async def save_page_results(file_id: str, page_results: List[Optional[str]]) -> bool:
+    """Store per-page outputs in their own collection (idempotent on retries)"""
+    try:
+        operations = [
+            UpdateOne(
+                {"file_id": file_id, "page": page},
+                {"$set": PageResultSchema(file_id=file_id, page=page, result=result).model_dump()},
+                upsert=True
+            )
+            for page, result in enumerate(page_results, start=1)
+        ]
+        if operations:
+            await get_pages_collection().bulk_write(operations, ordered=False)
+        return True
+    except Exception as e:
+        logger.error("Failed to save page results for file %s: %s", file_id, e)
+        return False
 
 async def cleanup_processing_files(file_path: str, image_paths: List[str]) -> bool:
     """Clean up processing files"""
@@ -98,66 +164,115 @@ async def cleanup_processing_files(file_path: str, image_paths: List[str]) -> bo
         await cleanup_files(files_to_cleanup)
         return True
     except Exception as e:
-        logger.error(f"Failed to cleanup processing files: {e}")
+        logger.error("Failed to cleanup processing files: %s", e)
         return False
 
-async def process_file(file_id: str, file_path: str) -> bool:
-    """Main file processing function"""
-    logger.info(f"Starting processing for file {file_id}")
+async def render_file(
+    file_id: str,
+    file_path: str,
+    max_pages: Optional[int] = None,
+    timeout: Optional[int] = None
+) -> Optional[List[str]]:
+    """Render stage: convert the PDF to images and record their paths"""
+    # Convert PDF to images
+    conversion_success, image_paths, conversion_error = await convert_pdf_to_images(
+        file_path, file_id, max_pages, timeout
+    )
     
-    try:
-        # Update status to processing
-        await update_file_status(file_id, "processing")
-        
-        # Convert PDF to images
-        conversion_success, image_paths, conversion_error = await convert_pdf_to_images(file_path, file_id)
-        
-        if not conversion_success:
-            await update_file_status(file_id, "failed", conversion_error)
-            return False
-        
-        # Update status after conversion
-        await update_file_status(file_id, "converting_to_image_success")
-        
-        # Update database with image paths
-        await files_collection.update_one(
-            {"_id": ObjectId(file_id)},
-            {
-                "$set": {
-                    "image_paths": image_paths,
-                    "updated_at": "$$NOW"
-                }
+    if not conversion_success:
+        await update_file_status(file_id, "failed", conversion_error)
+        return None
+    
+    # Update status after conversion
+    await update_file_status(file_id, "converting_to_image_success")
+    
+    # Update database with image paths
+    await get_files_collection().update_one(
+        {"_id": ObjectId(file_id)},
+        {
+            "$set": {
+                "image_paths": image_paths,
+                "updated_at": datetime.utcnow()
             }
-        )
-        
-        # Process images with AI
-        ai_success, ai_result, ai_error = await process_images_with_ai(image_paths)
-        
-        if not ai_success:
-            await update_file_status(file_id, "failed", ai_error)
-            return False
-        
-        # Update final status and result
-        await files_collection.update_one(
-            {"_id": ObjectId(file_id)},
-            {
-                "$set": {
-                    "status": "success",
-                    "result": ai_result,
-                    "updated_at": "$$NOW"
-                }
+        }
+    )
+    
+    return image_paths
+
+async def analyze_file(file_id: str, file_path: str, image_paths: List[str]) -> bool:
+    """AI stage: analyze rendered pages, store the result and clean up"""
+    # Process images with AI
+    ai_success, ai_result, page_results, ai_error = await process_images_with_ai(image_paths)
+    
+    if not ai_success:
+        await update_file_status(file_id, "failed", ai_error)
+        return False
+    
+    # Per-page outputs live outside the file document and are fetched on demand
+    await save_page_results(file_id, page_results)
+    
+    # Update final status and result (compressed or offloaded when large)
+    result_fields = await encode_result(file_id, ai_result)
+    previous = await get_files_collection().find_one_and_update(
+        {"_id": ObjectId(file_id)},
+        {
+            "$set": {
+                "status": "success",
+                **result_fields,
+                "updated_at": datetime.utcnow()
             }
+        },
+        projection={"status": 1, "result_gridfs_id": 1},
+        return_document=ReturnDocument.BEFORE
+    )
+    if previous:
+        record_status_change(previous.get("status"), "success")
+        # A reprocessed file replaces its result; drop the blob it no longer references
+        if previous.get("result_gridfs_id") and previous["result_gridfs_id"] != result_fields["result_gridfs_id"]:
+            await delete_result_blob(previous)
+    else:
+        # The record was deleted mid-job, nothing will reference this result
+        await delete_result_blob(result_fields)
+    record_pages_processed(len(image_paths))
+    
+    logger.info("Successfully processed file %s", file_id)
+    
+    # Cleanup temporary files; their paths no longer need to live on the document
+    if await cleanup_processing_files(file_path, image_paths):
+        await get_files_collection().update_one(
+            {"_id": ObjectId(file_id)},
+            {"$unset": {"image_paths": ""}}
         )
+    
+    return True
+
+async def fail_unexpectedly(file_id: str, error: Exception) -> bool:
+    """Record an unexpected processing error on the file"""
+    logger.error("Unexpected error during processing: %s", error)
+    error_msg = f"Unexpected error during processing: {error}"
+    await update_file_status(file_id, "failed", error_msg)
+    return False
+
+async def process_file(file_id: str, file_path: str, max_pages: Optional[int] = None) -> bool:
+    """Main file processing function"""
+    with log_context(file_id=file_id):
+        logger.info("Starting processing for file %s", file_id)
         
-        logger.info(f"Successfully processed file {file_id}")
-        
-        # Cleanup temporary files
-        await cleanup_processing_files(file_path, image_paths)
+        try:
+            # Guards against running the same file twice (redelivery, reaper re-enqueue)
+            if not await claim_file(file_id):
+                return False
+            
+            image_paths = await render_file(file_id, file_path, max_pages)
+            if image_paths is None:
+                return False
+            
+            return await analyze_file(file_id, file_path, image_paths)
         
-        return True
+        except Exception as e:
+            return await fail_unexpectedly(file_id, e)
         
-    except Exception as e:
-        error_msg = f"Unexpected error during processing: {e}"
-        logger.error(error_msg)
-        await update_file_status(file_id, "failed", error_msg)
-        return False
\ No newline at end of file
+        finally:
+            # A work horse that started its own log writer leaves through
+            # os._exit, which skips atexit; flush now and write directly after
+            shutdown_logging()
@@ -1,24 +1,70 @@
-from fastapi import FastAPI, UploadFile, HTTPException, Path, BackgroundTasks
-from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, UploadFile, HTTPException, Path, BackgroundTasks, Header, Query
+from fastapi.responses import JSONResponse, Response
 from bson import ObjectId
 import logging
-from typing import Optional
+from typing import Optional, List
+from datetime import datetime, timedelta
 
 # custom imports
-from .utils.file import save_file, validate_file, generate_file_path, get_file_size
-from .db.collections.files import files_collection, FileSchema
-from .queue.queue import queue
-from .queue.workers import process_file
-from .config import HOST, PORT
+from .utils.file import save_file, validate_file, generate_file_path, get_file_size, probe_page_count, cleanup_files
+from .utils.limits import get_tier_limits, resolve_tier, validate_page_count
+from .db.client import get_mongo_client, close_mongo_client, test_connection as test_mongo_connection
+from .db.collections.files import get_files_collection, create_file_indexes, FileSchema, ACTIVE_STATUSES
+from .db.collections.pages import get_pages_collection, create_page_indexes
+from .db.results import load_result, file_etag, has_inline_result, RESULT_BODY_FIELDS
+from .utils.cleanup import remove_file_artifacts, delete_file_records
+from .utils.stats import get_stats, record_status_change
+from .queue.queue import get_queue, get_queue_backlog, enqueue_file_job, close_redis_clients, test_redis_connection
+from .config import HOST, PORT, QUEUE_BACKLOG_LIMIT, QUEUE_RETRY_AFTER, STATS_HOURS_RETAINED
+from .utils.logger import setup_logging
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+setup_logging()
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app):
+    """Application lifespan manager"""
+    # Startup
+    logger.info("Starting Nexus PDF Processor...")
+
+    # Construct clients here rather than at import time
+    get_mongo_client()
+    get_queue()
+
+    # Test database connections
+    mongo_ok = await test_mongo_connection()
+    redis_ok = await test_redis_connection()
+
+    if not mongo_ok:
+        logger.error("MongoDB connection failed. Application may not work properly.")
+
+    if not redis_ok:
+        logger.error("Redis connection failed. Queue processing may not work properly.")
+
+    # Create database indexes
+    try:
+        await create_file_indexes()
+        await create_page_indexes()
+        logger.info("Database indexes created successfully")
+    except Exception as e:
+        logger.error(f"Failed to create database indexes: {e}")
+
+    logger.info("Nexus PDF Processor started successfully")
+
+    yield
+
+    # Shutdown
+    logger.info("Shutting down Nexus PDF Processor...")
+    await close_mongo_client()
+    close_redis_clients()
+
 app = FastAPI(
     title="Nexus PDF Processor",
     description="A PDF processing service that converts PDFs to images and analyzes them with AI",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 @app.get("/")
@@ -30,28 +76,65 @@ async def health_check():
         "version": "1.0.0"
     }
 
+@app.get("/stats")
+async def stats(hours: int = Query(24, ge=1, le=STATS_HOURS_RETAINED, description="Hourly buckets to return")):
+    """Processing stats from precomputed counters"""
+    try:
+        return {
+            **get_stats(hours),
+            "queue_backlog": get_queue_backlog()
+        }
+    except Exception as e:
+        logger.error(f"Error reading stats: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
 @app.get("/files/{file_id}")
-async def get_file(file_id: str = Path(..., description="The ID of the file to retrieve")):
+async def get_file(
+    response: Response,
+    file_id: str = Path(..., description="The ID of the file to retrieve"),
+    if_none_match: Optional[str] = Header(None)
+):
     """Get file processing status and results"""
     try:
         # Validate ObjectId format
         if not ObjectId.is_valid(file_id):
             raise HTTPException(status_code=400, detail="Invalid file ID format")
         
-        db_file = await files_collection.find_one({"_id": ObjectId(file_id)})
+        files_collection = get_files_collection()
+        db_file = await files_collection.find_one(
+            {"_id": ObjectId(file_id)},
+            {field: 0 for field in RESULT_BODY_FIELDS}
+        )
         
         if not db_file:
             raise HTTPException(status_code=404, detail="File not found")
         
+        # Skip reading, decompressing and re-sending a result the client already has
+        etag = file_etag(db_file)
+        if if_none_match:
+            client_etags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            if etag in client_etags or "*" in client_etags:
+                return Response(status_code=304, headers={"ETag": etag})
+        
+        response.headers["ETag"] = etag
+        
+        if has_inline_result(db_file):
+            body = await files_collection.find_one(
+                {"_id": db_file["_id"]},
+                {field: 1 for field in RESULT_BODY_FIELDS}
+            )
+            db_file.update(body or {})
+        
         return {
             "file_id": str(db_file["_id"]),
             "name": db_file["name"],
             "status": db_file["status"],
-            "result": db_file.get("result"),
+            "result": await load_result(db_file),
             "error": db_file.get("error"),
             "created_at": db_file.get("created_at"),
             "updated_at": db_file.get("updated_at"),
             "file_size": db_file.get("file_size"),
+            "page_count": db_file.get("page_count"),
             "image_paths": db_file.get("image_paths")
         }
         
@@ -61,10 +144,69 @@ async def get_file(file_id: str = Path(..., description="The ID of the file to r
         logger.error(f"Error retrieving file {file_id}: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@app.get("/files/{file_id}/pages")
+async def get_file_pages(
+    file_id: str = Path(..., description="The ID of the file whose page results to retrieve"),
+    limit: int = 10,
+    offset: int = 0
+):
+    """Get per-page AI results with pagination"""
+    try:
+        # Validate ObjectId format
+        if not ObjectId.is_valid(file_id):
+            raise HTTPException(status_code=400, detail="Invalid file ID format")
+        
+        pages_collection = get_pages_collection()
+        total = await pages_collection.count_documents({"file_id": file_id})
+        if total == 0:
+            if not await get_files_collection().find_one({"_id": ObjectId(file_id)}, {"_id": 1}):
+                raise HTTPException(status_code=404, detail="File not found")
+        
+        cursor = pages_collection.find(
+            {"file_id": file_id},
+            {"_id": 0, "page": 1, "result": 1}
+        ).sort("page", 1).skip(offset).limit(limit)
+        pages = await cursor.to_list(length=limit)
+        
+        return {
+            "file_id": file_id,
+            "pages": pages,
+            "total": total,
+            "limit": limit,
+            "offset": offset
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving pages for file {file_id}: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
 @app.post("/upload")
-async def upload_file(file: UploadFile, background_tasks: BackgroundTasks):
+async def upload_file(
+    file: UploadFile,
+    background_tasks: BackgroundTasks,
+    x_service_tier: Optional[str] = Header(None, description="Processing tier, set by the upstream gateway"),
+    x_gateway_secret: Optional[str] = Header(None, description="Shared secret proving the tier came from the gateway")
+):
     """Upload and process a PDF file"""
     try:
+        # Resolve the page and time budget for this request; clients can't pick their own tier
+        tier = resolve_tier(x_service_tier, x_gateway_secret)
+        limits = get_tier_limits(tier)
+        if limits is None:
+            raise HTTPException(status_code=400, detail=f"Unknown service tier: {tier}")
+
+        # Shed load before doing any work if workers are already behind
+        backlog = get_queue_backlog()
+        if backlog >= QUEUE_BACKLOG_LIMIT:
+            logger.warning("Rejecting upload, queue backlog %d >= %d", backlog, QUEUE_BACKLOG_LIMIT)
+            raise HTTPException(
+                status_code=429,
+                detail="Processing queue is full, please retry later",
+                headers={"Retry-After": str(QUEUE_RETRY_AFTER)}
+            )
+
         # Read file content
         file_content = await file.read()
         
@@ -77,10 +219,11 @@ async def upload_file(file: UploadFile, background_tasks: BackgroundTasks):
         file_schema = FileSchema(
             name=file.filename,
             status="saving",
-            file_size=len(file_content)
+            file_size=len(file_content),
+            tier=tier
         )
         
-        db_file = await files_collection.insert_one(file_schema.dict())
+        db_file = await get_files_collection().insert_one(file_schema.dict())
         file_id = str(db_file.inserted_id)
         
         # Generate file path and save file
@@ -89,44 +232,62 @@ async def upload_file(file: UploadFile, background_tasks: BackgroundTasks):
         
         if not save_success:
             # Cleanup database record if file save failed
-            await files_collection.delete_one({"_id": db_file.inserted_id})
+            await get_files_collection().delete_one({"_id": db_file.inserted_id})
             raise HTTPException(status_code=500, detail="Failed to save file")
         
+        # Probe page count cheaply and enforce the tier's page budget
+        probe_ok, page_count, probe_error = await probe_page_count(file_path)
+        if probe_ok:
+            probe_ok, probe_error = validate_page_count(page_count, limits)
+        
+        if not probe_ok:
+            await get_files_collection().delete_one({"_id": db_file.inserted_id})
+            await cleanup_files([file_path])
+            status_code = 413 if page_count else 400
+            raise HTTPException(status_code=status_code, detail=probe_error)
+        
         # Update database with file path
-        await files_collection.update_one(
+        await get_files_collection().update_one(
             {"_id": db_file.inserted_id},
             {
                 "$set": {
                     "file_path": file_path,
+                    "page_count": page_count,
                     "status": "queued",
-                    "updated_at": "$$NOW"
+                    "updated_at": datetime.utcnow()
                 }
             }
         )
         
+        # Counted before enqueueing so a fast worker's queued -> processing
+        # transition never lands ahead of it; the short-lived "saving" state is not tracked
+        record_status_change(None, "queued")
+        
         # Add processing job to queue
         try:
-            job = queue.enqueue(process_file, file_id, file_path, job_id=file_id)
-            logger.info(f"Added file {file_id} to processing queue")
+            job = enqueue_file_job(file_id, file_path, page_count, limits)
+            logger.info("Added file %s to processing queue", file_id)
         except Exception as e:
-            logger.error(f"Failed to add file {file_id} to queue: {e}")
+            logger.error("Failed to add file %s to queue: %s", file_id, e)
             # Update status to failed if queue addition fails
-            await files_collection.update_one(
+            await get_files_collection().update_one(
                 {"_id": db_file.inserted_id},
                 {
                     "$set": {
                         "status": "failed",
                         "error": f"Failed to add to processing queue: {e}",
-                        "updated_at": "$$NOW"
+                        "updated_at": datetime.utcnow()
                     }
                 }
             )
+            record_status_change("queued", "failed")
             raise HTTPException(status_code=500, detail="Failed to queue file for processing")
         
         return {
             "file_id": file_id,
             "filename": file.filename,
             "status": "queued",
+            "page_count": page_count,
             "message": "File uploaded and queued for processing"
         }
         
@@ -140,7 +301,10 @@ async def upload_file(file: UploadFile, background_tasks: BackgroundTasks):
 async def list_files(limit: int = 10, offset: int = 0):
     """List recent files with pagination"""
     try:
-        cursor = files_collection.find().sort("created_at", -1).skip(offset).limit(limit)
+        cursor = get_files_collection().find(
+            {},
+            {"name": 1, "status": 1, "created_at": 1, "file_size": 1}
+        ).sort("created_at", -1).skip(offset).limit(limit)
         files = await cursor.to_list(length=limit)
         
         return {
@@ -163,6 +327,38 @@ async def list_files(limit: int = 10, offset: int = 0):
         logger.error(f"Error listing files: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@app.delete("/files")
+async def delete_files(
+    ids: Optional[List[str]] = Query(None, description="File IDs to delete"),
+    status: Optional[str] = Query(None, description="Delete files with this status"),
+    older_than: Optional[int] = Query(None, ge=0, description="Delete files created more than this many seconds ago")
+):
+    """Bulk delete files and their processing results"""
+    try:
+        if not ids and status is None and older_than is None:
+            raise HTTPException(status_code=400, detail="At least one of ids, status or older_than is required")
+        
+        # Filters are combined, e.g. failed files older than a day
+        query = {}
+        if ids:
+            if not all(ObjectId.is_valid(file_id) for file_id in ids):
+                raise HTTPException(status_code=400, detail="Invalid file ID format")
+            query["_id"] = {"$in": [ObjectId(file_id) for file_id in ids]}
+        if status is not None:
+            query["status"] = status
+        if older_than is not None:
+            query["created_at"] = {"$lt": datetime.utcnow() - timedelta(seconds=older_than)}
+        
+        deleted = await delete_file_records(query)
+        
+        return {"message": "Files deleted successfully", "deleted": deleted}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error bulk deleting files: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
 @app.delete("/files/{file_id}")
 async def delete_file(file_id: str = Path(..., description="The ID of the file to delete")):
     """Delete a file and its processing results"""
@@ -172,15 +368,21 @@ async def delete_file(file_id: str = Path(..., description="The ID of the file t
             raise HTTPException(status_code=400, detail="Invalid file ID format")
         
         # Find file in database
-        db_file = await files_collection.find_one({"_id": ObjectId(file_id)})
+        db_file = await get_files_collection().find_one({"_id": ObjectId(file_id)})
         
         if not db_file:
             raise HTTPException(status_code=404, detail="File not found")
         
-        # Delete from database
-        await files_collection.delete_one({"_id": ObjectId(file_id)})
+        # Delete from database, unless a worker may still be processing it
+        result = await get_files_collection().delete_one(
+            {"_id": ObjectId(file_id), "status": {"$nin": ACTIVE_STATUSES}}
+        )
+        if result.deleted_count == 0:
+            raise HTTPException(status_code=409, detail="File is still being processed")
         
-        # TODO: Clean up associated files from storage
+        # Clean up page results, result blob and files on disk
+        await remove_file_artifacts([db_file])
+        record_status_change(db_file.get("status"), None)
         
         return {"message": "File deleted successfully"}
         
@@ -1,14 +1,36 @@
 import base64
+import hashlib
 import logging
-from typing import Optional, List
+import re
+from typing import Optional, List, Dict, Any
 from openai import OpenAI
 import asyncio
 
 # custom imports
-from ..config import GEMINI_API_KEY, AI_MODEL, AI_BASE_URL
+from ..config import (
+    GEMINI_API_KEY, AI_MODEL, AI_BASE_URL,
+    AI_CACHE_ENABLED, AI_CACHE_TTL,
+    AI_BATCH_ENABLED, AI_BATCH_MAX_PAGES, AI_BATCH_MAX_BYTES, AI_BATCH_PAGE_MAX_BYTES,
+    RESULT_MAX_CHARS, AI_REDUCE_BATCH_SIZE, AI_REDUCE_CONCURRENCY
+)
+from ..queue.queue import get_redis_client
+from .logger import log_context, SAMPLED
+from .stats import record_ai_usage
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_PROMPT = "Based on the image, Roast the resume"
+CACHE_KEY_PREFIX = "nexus:ai_cache:"
+BATCH_PAGE_MARKER = "### Page "
+PAGE_BREAK = "\n\n--- Page Break ---\n\n"
+REDUCE_PROMPT = (
+    "The following are analyses of consecutive parts of the same document. "
+    "Merge them into one coherent analysis, removing repetition and keeping the most important points. "
+    "Keep the answer under {max_chars} characters."
+)
+
+_ai_client: Optional[OpenAI] = None
+
 def create_ai_client() -> OpenAI:
     """Create OpenAI-compatible client for Gemini"""
     return OpenAI(
@@ -16,48 +38,90 @@ def create_ai_client() -> OpenAI:
         base_url=AI_BASE_URL
     )
 
-def encode_image_to_base64(image_path: str) -> str:
-    """Encode image file to base64 string"""
+def get_ai_client() -> OpenAI:
+    """Return the shared AI client, creating it on first use"""
+    global _ai_client
+    if _ai_client is None:
+        _ai_client = create_ai_client()
+    return _ai_client
+
+def read_image(image_path: str) -> bytes:
+    """Read raw image bytes from disk"""
     try:
         with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode("utf-8")
+            return image_file.read()
     except Exception as e:
-        logger.error(f"Failed to encode image {image_path}: {e}")
+        logger.error("Failed to read image %s: %s", image_path, e)
         raise
 
-async def process_image_with_ai(image_base64: str, prompt: str = "Based on the image, Roast the resume") -> Optional[str]:
-    """Process image with AI using retry logic"""
-    client = create_ai_client()
+def make_cache_key(image_bytes: bytes, prompt: str) -> str:
+    """Cache key for a page: image content hash + prompt + model"""
+    digest = hashlib.sha256()
+    digest.update(AI_MODEL.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(prompt.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(hashlib.sha256(image_bytes).digest())
+    return CACHE_KEY_PREFIX + digest.hexdigest()
+
+def get_cached_result(cache_key: str) -> Optional[str]:
+    """Look up a cached AI response; cache failures never fail processing"""
+    if not AI_CACHE_ENABLED:
+        return None
+    try:
+        return get_redis_client().get(cache_key)
+    except Exception as e:
+        logger.warning("AI cache lookup failed: %s", e)
+        return None
+
+def set_cached_result(cache_key: str, result: str) -> None:
+    """Store an AI response in the cache"""
+    if not AI_CACHE_ENABLED:
+        return
+    try:
+        get_redis_client().set(cache_key, result, ex=AI_CACHE_TTL)
+    except Exception as e:
+        logger.warning("AI cache write failed: %s", e)
+
+def build_messages(prompt: str, images_base64: List[str]) -> List[Dict[str, Any]]:
+    """Build a single user message carrying the prompt and one or more images"""
+    content: List[Dict[str, Any]] = [{"type": "text", "text": prompt}]
+    for image_base64 in images_base64:
+        content.append({
+            "type": "image_url",
+            "image_url": {"url": f"data:image/jpeg;base64,{image_base64}"}
+        })
+    return [{"role": "user", "content": content}]
+
+async def request_completion(messages: List[Dict[str, Any]], max_tokens: int = 1000) -> Optional[str]:
+    """Send a chat completion request using retry logic"""
+    client = get_ai_client()
     max_retries = 3
     retry_delay = 1
     
     for attempt in range(max_retries):
         try:
-            response = client.chat.completions.create(
+            # The client is synchronous; run it off the event loop so calls can overlap
+            response = await asyncio.to_thread(
+                client.chat.completions.create,
                 model=AI_MODEL,
-                messages=[
-                    { 
-                        "type": "input_text", 
-                        "text": prompt 
-                    },
-                    {
-                        "type": "input_image",
-                        "image_url": f"data:image/jpeg;base64,{image_base64}",
-                    },
-                ],
-                max_tokens=1000,
+                messages=messages,
+                max_tokens=max_tokens,
                 temperature=0.7
             )
             
+            if response.usage:
+                record_ai_usage(response.usage.prompt_tokens or 0, response.usage.completion_tokens or 0)
+            
             if response.choices and response.choices[0].message.content:
-                logger.info("AI processing completed successfully")
+                logger.info("AI processing completed successfully", extra=SAMPLED)
                 return response.choices[0].message.content
             else:
                 logger.warning("AI response was empty")
                 return None
                 
         except Exception as e:
-            logger.error(f"AI processing attempt {attempt + 1} failed: {e}")
+            logger.error("AI processing attempt %d failed: %s", attempt + 1, e)
             if attempt < max_retries - 1:
                 await asyncio.sleep(retry_delay)
                 retry_delay *= 2  # Exponential backoff
@@ -67,19 +131,126 @@ async def process_image_with_ai(image_base64: str, prompt: str = "Based on the i
     
     return None
 
-async def process_multiple_images_with_ai(image_paths: List[str], prompt: str = "Based on the image, Roast the resume") -> List[Optional[str]]:
-    """Process multiple images with AI"""
-    results = []
-    
-    for image_path in image_paths:
+async def process_image_with_ai(image_base64: str, prompt: str = DEFAULT_PROMPT) -> Optional[str]:
+    """Process image with AI using retry logic"""
+    return await request_completion(build_messages(prompt, [image_base64]))
+
+def split_batch_response(response: str, page_count: int) -> Optional[List[str]]:
+    """Split a packed response on its page markers, or None if they don't line up"""
+    pattern = re.compile(rf"^{re.escape(BATCH_PAGE_MARKER)}(\d+)\s*$", re.MULTILINE)
+    matches = list(pattern.finditer(response))
+    if [int(match.group(1)) for match in matches] != list(range(1, page_count + 1)):
+        return None
+
+    sections = []
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(response)
+        sections.append(response[match.end():end].strip())
+    return sections
+
+async def process_image_batch_with_ai(images_base64: List[str], prompt: str = DEFAULT_PROMPT) -> List[Optional[str]]:
+    """Analyze several pages in one request, falling back to one request per page"""
+    batch_prompt = (
+        f"{prompt}\n\n"
+        f"The {len(images_base64)} images are separate pages. Answer for each page in order, "
+        f"starting each answer with a line '{BATCH_PAGE_MARKER}N' where N is the page's position (1 to {len(images_base64)})."
+    )
+    try:
+        response = await request_completion(
+            build_messages(batch_prompt, images_base64),
+            max_tokens=1000 * len(images_base64)
+        )
+        sections = split_batch_response(response, len(images_base64)) if response else None
+        if sections is not None:
+            return sections
+        logger.warning("Packed AI response did not match %d pages, retrying pages individually", len(images_base64))
+    except Exception as e:
+        logger.warning("Packed AI request for %d pages failed, retrying pages individually: %s", len(images_base64), e)
+
+    # One failing page must not cost the others in the batch their answer
+    outputs: List[Optional[str]] = []
+    for position, image_base64 in enumerate(images_base64):
         try:
-            base64_image = encode_image_to_base64(image_path)
-            result = await process_image_with_ai(base64_image, prompt)
-            results.append(result)
+            outputs.append(await process_image_with_ai(image_base64, prompt))
         except Exception as e:
-            logger.error(f"Failed to process image {image_path}: {e}")
-            results.append(None)
-    
+            logger.error("Failed to process page %d of packed request: %s", position + 1, e)
+            outputs.append(None)
+    return outputs
+
+def plan_batches(page_sizes: List[int]) -> List[List[int]]:
+    """Group small pages, in page order, into packed requests within the byte/page budget"""
+    if not AI_BATCH_ENABLED:
+        return [[i] for i in range(len(page_sizes))]
+
+    batches: List[List[int]] = []
+    current: List[int] = []
+    current_bytes = 0
+
+    for i, size in enumerate(page_sizes):
+        if size > AI_BATCH_PAGE_MAX_BYTES:
+            batches.append([i])
+            continue
+        if current and (len(current) >= AI_BATCH_MAX_PAGES or current_bytes + size > AI_BATCH_MAX_BYTES):
+            batches.append(current)
+            current, current_bytes = [], 0
+        current.append(i)
+        current_bytes += size
+
+    if current:
+        batches.append(current)
+    return batches
+
+async def process_multiple_images_with_ai(image_paths: List[str], prompt: str = DEFAULT_PROMPT) -> List[Optional[str]]:
+    """Process multiple images with AI, reusing cached answers and packing small pages"""
+    results: List[Optional[str]] = [None] * len(image_paths)
+    duplicates: Dict[str, List[int]] = {}
+    pending: List[tuple[int, bytes, str]] = []
+
+    # Resolve cache hits and repeated pages before calling the model
+    for index, image_path in enumerate(image_paths):
+        with log_context(page=index + 1):
+            try:
+                image_bytes = read_image(image_path)
+            except Exception as e:
+                logger.error("Failed to process image %s: %s", image_path, e)
+                continue
+
+        cache_key = make_cache_key(image_bytes, prompt)
+        if cache_key in duplicates:
+            duplicates[cache_key].append(index)
+            continue
+        duplicates[cache_key] = [index]
+
+        cached = get_cached_result(cache_key)
+        if cached is not None:
+            results[index] = cached
+        else:
+            pending.append((index, image_bytes, cache_key))
+
+    for batch in plan_batches([len(image_bytes) for _, image_bytes, _ in pending]):
+        pages = [pending[i] for i in batch]
+        images_base64 = [base64.b64encode(image_bytes).decode("utf-8") for _, image_bytes, _ in pages]
+
+        with log_context(page=pages[0][0] + 1):
+            try:
+                if len(pages) == 1:
+                    outputs = [await process_image_with_ai(images_base64[0], prompt)]
+                else:
+                    outputs = await process_image_batch_with_ai(images_base64, prompt)
+            except Exception as e:
+                logger.error("Failed to process pages %s: %s", [index + 1 for index, _, _ in pages], e)
+                continue
+
+        for (index, _, cache_key), output in zip(pages, outputs):
+            results[index] = output
+            if output:
+                set_cached_result(cache_key, output)
+
+    # Repeated pages share the answer of their first occurrence
+    for indexes in duplicates.values():
+        for index in indexes[1:]:
+            results[index] = results[indexes[0]]
+
     return results
 
 def combine_ai_results(results: List[Optional[str]]) -> str:
@@ -93,5 +264,52 @@ def combine_ai_results(results: List[Optional[str]]) -> str:
         return valid_results[0]
     
     # Combine multiple results
-    combined = "\n\n--- Page Break ---\n\n".join(valid_results)
-    return combined
\ No newline at end of file
+    combined = PAGE_BREAK.join(valid_results)
+    return combined
+
+def truncate_result(result: str, max_chars: int = RESULT_MAX_CHARS) -> str:
+    """Hard bound on a result's size, cutting at a line break where possible"""
+    if len(result) <= max_chars:
+        return result
+    cut = result.rfind("\n", 0, max_chars)
+    return result[:cut if cut > 0 else max_chars].rstrip() + "\n\n[truncated]"
+
+async def reduce_ai_results(results: List[Optional[str]], max_chars: int = RESULT_MAX_CHARS) -> str:
+    """Map-reduce page outputs into a single result of bounded size"""
+    texts = [result for result in results if result]
+
+    if not texts:
+        return "No valid results from AI processing"
+
+    # Short documents are joined as before, without extra model calls
+    combined = combine_ai_results(texts)
+    if len(combined) <= max_chars:
+        return combined
+
+    semaphore = asyncio.Semaphore(AI_REDUCE_CONCURRENCY)
+    prompt = REDUCE_PROMPT.format(max_chars=max_chars)
+
+    async def reduce_batch(batch: List[str]) -> str:
+        # A leftover single result moves up a level unchanged, no model call needed
+        if len(batch) == 1:
+            return batch[0]
+        async with semaphore:
+            try:
+                merged = await request_completion(
+                    [{"role": "user", "content": f"{prompt}\n\n{PAGE_BREAK.join(batch)}"}],
+                    max_tokens=max(256, max_chars // 4)
+                )
+            except Exception as e:
+                logger.error("Failed to reduce %d results: %s", len(batch), e)
+                merged = None
+        # Never lose a batch to a failed reduce, just bound its size
+        return merged or truncate_result(PAGE_BREAK.join(batch), max_chars)
+
+    # Each level merges batches in parallel until a single result remains
+    while len(texts) > 1:
+        batch_size = max(2, AI_REDUCE_BATCH_SIZE)
+        batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+        logger.info("Reducing %d results in %d batches", len(texts), len(batches))
+        texts = list(await asyncio.gather(*(reduce_batch(batch) for batch in batches)))
+
+    return truncate_result(texts[0], max_chars)
@@ -0,0 +1,145 @@
+import os
+import re
+import time
+import shutil
+import asyncio
+import logging
+from typing import List, Dict, Any
+
+from bson import ObjectId
+
+# custom imports
+from ..db.collections.files import get_files_collection, ACTIVE_STATUSES
+from ..db.collections.pages import get_pages_collection
+from ..db.results import get_results_bucket, delete_result_blob
+from .stats import record_status_change
+from ..config import UPLOAD_DIR, IMAGE_DIR, CLEANUP_BATCH_SIZE, SWEEP_GRACE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Uploads are saved as "<file_id>-<filename>", page images under IMAGE_DIR/<file_id>/
+UPLOAD_NAME_PATTERN = re.compile(r"^([0-9a-f]{24})-")
+IMAGE_DIR_PATTERN = re.compile(r"^([0-9a-f]{24})$")
+
+def remove_paths(paths: List[str]) -> int:
+    """Remove files and directories from disk (blocking), returning how many were removed"""
+    removed = 0
+    for path in paths:
+        try:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            elif os.path.exists(path):
+                os.remove(path)
+            else:
+                continue
+            removed += 1
+        except OSError as e:
+            logger.error("Failed to remove %s: %s", path, e)
+    return removed
+
+async def remove_file_artifacts(db_files: List[Dict[str, Any]]) -> None:
+    """Remove page results, result blobs and files on disk for deleted records"""
+    if not db_files:
+        return
+
+    file_ids = [str(db_file["_id"]) for db_file in db_files]
+    await get_pages_collection().delete_many({"file_id": {"$in": file_ids}})
+
+    for db_file in db_files:
+        await delete_result_blob(db_file)
+
+    paths = [db_file["file_path"] for db_file in db_files if db_file.get("file_path")]
+    paths += [os.path.join(IMAGE_DIR, file_id) for file_id in file_ids]
+    await asyncio.to_thread(remove_paths, paths)
+
+async def delete_file_records(query: Dict[str, Any], batch_size: int = CLEANUP_BATCH_SIZE) -> int:
+    """Delete matching file records in batches, together with their artifacts
+
+    Files a worker may still be processing are skipped, deleting them would
+    pull the PDF and images from under the job and orphan what it writes.
+    """
+    files_collection = get_files_collection()
+    projection = {"status": 1, "file_path": 1, "result_gridfs_id": 1}
+    idle = {"status": {"$nin": ACTIVE_STATUSES}}
+    query = {"$and": [query, idle]}
+    deleted = 0
+
+    while True:
+        batch = await files_collection.find(query, projection).limit(batch_size).to_list(length=batch_size)
+        if not batch:
+            break
+
+        result = await files_collection.delete_many({"_id": {"$in": [db_file["_id"] for db_file in batch]}, **idle})
+        deleted += result.deleted_count
+        await remove_file_artifacts(batch)
+        for db_file in batch:
+            record_status_change(db_file.get("status"), None)
+
+        if len(batch) < batch_size or result.deleted_count == 0:
+            break
+
+    logger.info("Deleted %d file records", deleted)
+    return deleted
+
+def scan_artifacts(grace_seconds: int) -> Dict[str, List[str]]:
+    """Map file ids to upload/image paths on disk older than the grace period (blocking)"""
+    cutoff = time.time() - grace_seconds
+    artifacts: Dict[str, List[str]] = {}
+
+    for directory, pattern in ((UPLOAD_DIR, UPLOAD_NAME_PATTERN), (IMAGE_DIR, IMAGE_DIR_PATTERN)):
+        if not os.path.isdir(directory):
+            continue
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                match = pattern.match(entry.name)
+                if match and entry.stat(follow_symlinks=False).st_mtime < cutoff:
+                    artifacts.setdefault(match.group(1), []).append(entry.path)
+
+    return artifacts
+
+async def find_missing_file_ids(file_ids: List[str]) -> List[str]:
+    """Return the ids in file_ids that have no file record"""
+    existing = await get_files_collection().find(
+        {"_id": {"$in": [ObjectId(file_id) for file_id in file_ids]}},
+        {"_id": 1}
+    ).to_list(length=len(file_ids))
+    existing_ids = {str(db_file["_id"]) for db_file in existing}
+    return [file_id for file_id in file_ids if file_id not in existing_ids]
+
+async def delete_orphaned_blobs(blobs: List[tuple[ObjectId, str]]) -> int:
+    """Delete the GridFS results in a batch whose file record is gone"""
+    if not blobs:
+        return 0
+    missing = set(await find_missing_file_ids([file_id for _, file_id in blobs]))
+    deleted = 0
+    for gridfs_id, file_id in blobs:
+        if file_id in missing and await delete_result_blob({"result_gridfs_id": gridfs_id}):
+            deleted += 1
+    return deleted
+
+async def sweep_orphaned_artifacts(
+    batch_size: int = CLEANUP_BATCH_SIZE,
+    grace_seconds: int = SWEEP_GRACE_SECONDS
+) -> Dict[str, int]:
+    """Remove uploads, page images and result blobs whose file record is gone"""
+    counts = {"paths": 0, "result_blobs": 0}
+
+    # Files on disk, checked against Mongo one batch of ids at a time
+    artifacts = await asyncio.to_thread(scan_artifacts, grace_seconds)
+    file_ids = list(artifacts)
+    for i in range(0, len(file_ids), batch_size):
+        missing = await find_missing_file_ids(file_ids[i:i + batch_size])
+        paths = [path for file_id in missing for path in artifacts[file_id]]
+        counts["paths"] += await asyncio.to_thread(remove_paths, paths)
+
+    # Offloaded results whose file record expired or was deleted
+    blobs: List[tuple[ObjectId, str]] = []
+    async for grid_out in get_results_bucket().find({"metadata.file_id": {"$exists": True}}):
+        blobs.append((grid_out._id, grid_out.metadata["file_id"]))
+        if len(blobs) >= batch_size:
+            counts["result_blobs"] += await delete_orphaned_blobs(blobs)
+            blobs = []
+    counts["result_blobs"] += await delete_orphaned_blobs(blobs)
+
+    logger.info("Orphan sweep removed %d paths and %d result blobs", counts["paths"], counts["result_blobs"])
+    return counts
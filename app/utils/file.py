@@ -1,11 +1,13 @@
 import os
+import re
+import asyncio
 import aiofiles
 import logging
 from typing import List, Optional
 from pathlib import Path
 import mimetypes
 
-from ..config import UPLOAD_DIR, IMAGE_DIR, MAX_FILE_SIZE
+from ..config import UPLOAD_DIR, IMAGE_DIR, MAX_FILE_SIZE, PDFINFO_TIMEOUT
 
 logger = logging.getLogger(__name__)
 
@@ -18,10 +20,10 @@ async def save_file(file_content: bytes, file_path: str) -> bool:
         async with aiofiles.open(file_path, 'wb') as out_file:
             await out_file.write(file_content)
         
-        logger.info(f"File saved successfully: {file_path}")
+        logger.info("File saved successfully: %s", file_path)
         return True
     except Exception as e:
-        logger.error(f"Failed to save file {file_path}: {e}")
+        logger.error("Failed to save file %s: %s", file_path, e)
         return False
 
 def validate_file(file_content: bytes, filename: str) -> tuple[bool, Optional[str]]:
@@ -37,6 +39,36 @@ def validate_file(file_content: bytes, filename: str) -> tuple[bool, Optional[st
     
     return True, None
 
+async def probe_page_count(file_path: str) -> tuple[bool, Optional[int], Optional[str]]:
+    """Read the page count with poppler's pdfinfo without rendering anything"""
+    try:
+        process = await asyncio.create_subprocess_exec(
+            "pdfinfo", file_path,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+    except FileNotFoundError:
+        # poppler not installed on this host: page count is unknown, not invalid
+        logger.warning("pdfinfo not available, skipping page count probe")
+        return True, None, None
+
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=PDFINFO_TIMEOUT)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        return False, None, "Timed out while inspecting PDF"
+
+    if process.returncode != 0:
+        logger.error("pdfinfo failed for %s: %s", file_path, stderr.decode(errors="replace").strip())
+        return False, None, "Invalid or unreadable PDF file"
+
+    match = re.search(r"^Pages:\s+(\d+)", stdout.decode(errors="replace"), re.MULTILINE)
+    if not match:
+        return False, None, "Could not determine PDF page count"
+
+    return True, int(match.group(1)), None
+
 def generate_file_path(file_id: str, filename: str) -> str:
     """Generate file path for uploaded file"""
     return os.path.join(UPLOAD_DIR, f"{file_id}-{filename}")
@@ -55,10 +87,10 @@ async def cleanup_files(file_paths: List[str]) -> bool:
         for file_path in file_paths:
             if os.path.exists(file_path):
                 os.remove(file_path)
-                logger.info(f"Cleaned up file: {file_path}")
+                logger.debug("Cleaned up file: %s", file_path)
         return True
     except Exception as e:
-        logger.error(f"Failed to cleanup files: {e}")
+        logger.error("Failed to cleanup files: %s", e)
         return False
 
 def get_file_size(file_path: str) -> int:
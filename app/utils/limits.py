@@ -0,0 +1,35 @@
+import hmac
+from typing import Optional, Dict, Any
+
+from ..config import TIER_LIMITS, DEFAULT_TIER, TIER_GATEWAY_SECRET
+
+def resolve_tier(tier_header: Optional[str], gateway_secret: Optional[str]) -> str:
+    """Return the requested tier only when the trusted gateway vouched for it, else DEFAULT_TIER"""
+    if not tier_header or not TIER_GATEWAY_SECRET or not gateway_secret:
+        return DEFAULT_TIER
+    if not hmac.compare_digest(gateway_secret.encode(), TIER_GATEWAY_SECRET.encode()):
+        return DEFAULT_TIER
+    return tier_header
+
+def get_tier_limits(tier: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Return the processing budget for a tier, or None if the tier is unknown"""
+    return TIER_LIMITS.get(tier or DEFAULT_TIER)
+
+def validate_page_count(page_count: Optional[int], limits: Dict[str, Any]) -> tuple[bool, Optional[str]]:
+    """Check a probed page count against a tier's page budget"""
+    if page_count is None:
+        return True, None
+
+    if page_count <= 0:
+        return False, "PDF has no pages"
+
+    if page_count > limits["max_pages"]:
+        return False, f"PDF has {page_count} pages, exceeding the limit of {limits['max_pages']} pages"
+
+    return True, None
+
+def compute_job_timeout(page_count: Optional[int], limits: Dict[str, Any]) -> int:
+    """Scale the RQ job timeout with page count, capped by the tier budget"""
+    pages = page_count or limits["max_pages"]
+    timeout = limits["base_timeout"] + pages * limits["seconds_per_page"]
+    return min(timeout, limits["max_timeout"])
@@ -1,6 +1,172 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import random
 import sys
-from typing import Optional
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Iterator, Optional
+
+# Correlation ids attached to every record emitted inside a log_context block
+_file_id_var: ContextVar[Optional[str]] = ContextVar("log_file_id", default=None)
+_page_var: ContextVar[Optional[int]] = ContextVar("log_page", default=None)
+
+# Pass as `extra=SAMPLED` on high-volume per-page info logs
+SAMPLED = {"sampled": True}
+
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[logging.handlers.QueueHandler] = None
+_stream_handler: Optional[logging.Handler] = None
+
+class JsonFormatter(logging.Formatter):
+    """Render log records as single-line JSON objects"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+
+        # Correlation ids and any custom `extra` fields
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS and key != "sampled" and value is not None:
+                payload[key] = value
+
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload["exc_info"] = record.exc_text
+
+        return json.dumps(payload, default=str)
+
+class ContextFilter(logging.Filter):
+    """Attach file_id/page correlation ids from the current context"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "file_id"):
+            record.file_id = _file_id_var.get()
+        if not hasattr(record, "page"):
+            record.page = _page_var.get()
+        return True
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of info-level records marked as sampled"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = max(0.0, min(1.0, rate))
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO or not getattr(record, "sampled", False):
+            return True
+        return random.random() < self.rate
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting and writing to the listener thread"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Interpolate now so mutable args are logged as they were at the call
+        record.msg = record.getMessage()
+        record.args = None
+        # Tracebacks must be rendered here, the frames are gone once we return
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+@contextmanager
+def log_context(file_id: Optional[str] = None, page: Optional[int] = None) -> Iterator[None]:
+    """Bind correlation ids to every log record emitted inside the block"""
+    tokens = []
+    if file_id is not None:
+        tokens.append((_file_id_var, _file_id_var.set(file_id)))
+    if page is not None:
+        tokens.append((_page_var, _page_var.set(page)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+def setup_logging(
+    level: Optional[str] = None,
+    log_format: Optional[str] = None,
+    page_sample_rate: Optional[float] = None
+) -> None:
+    """Configure root logging with a background writer thread (idempotent)"""
+    global _listener, _queue_handler, _stream_handler
+
+    if _stream_handler is not None:
+        return
+
+    from ..config import LOG_LEVEL, LOG_FORMAT, LOG_PAGE_SAMPLE_RATE
+
+    level = level or LOG_LEVEL
+    log_format = log_format or LOG_FORMAT
+    page_sample_rate = LOG_PAGE_SAMPLE_RATE if page_sample_rate is None else page_sample_rate
+
+    # Writer side: runs in the listener thread, off the event loop
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if log_format == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - [file_id=%(file_id)s page=%(page)s] %(message)s'
+        ))
+
+    # Caller side: only context capture, sampling and a queue put
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+    for log_filter in (ContextFilter(), SamplingFilter(page_sample_rate)):
+        queue_handler.addFilter(log_filter)
+        stream_handler.addFilter(log_filter)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _queue_handler, _stream_handler = queue_handler, stream_handler
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+def _write_directly() -> None:
+    """Swap the queue handler for the stream handler so records are written synchronously"""
+    root = logging.getLogger()
+    if _queue_handler in root.handlers:
+        root.removeHandler(_queue_handler)
+    if _stream_handler is not None and _stream_handler not in root.handlers:
+        root.addHandler(_stream_handler)
+
+def _after_fork_in_child() -> None:
+    # The listener thread does not survive a fork, and forked work horses
+    # leave through os._exit without running atexit, so write directly
+    global _listener
+
+    if _listener is not None:
+        _listener = None
+        _write_directly()
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the background writer; later records are written directly"""
+    global _listener
+
+    if _listener is not None:
+        _write_directly()
+        _listener.stop()
+        _listener = None
 
 def setup_logger(
     name: str,
@@ -8,25 +174,25 @@ def setup_logger(
     format_string: Optional[str] = None
 ) -> logging.Logger:
     """Setup and configure logger"""
-    
+
     if format_string is None:
         format_string = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    
+
     logger = logging.getLogger(name)
     logger.setLevel(level)
-    
+
     # Avoid adding handlers multiple times
     if not logger.handlers:
         handler = logging.StreamHandler(sys.stdout)
         handler.setLevel(level)
-        
+
         formatter = logging.Formatter(format_string)
         handler.setFormatter(formatter)
-        
+
         logger.addHandler(handler)
-    
+
     return logger
 
 def get_logger(name: str) -> logging.Logger:
     """Get logger instance"""
-    return logging.getLogger(name) 
\ No newline at end of file
+    return logging.getLogger(name)
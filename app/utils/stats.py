@@ -0,0 +1,106 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any
+
+# custom imports
+from ..queue.queue import get_redis_client
+from ..db.collections.files import get_files_collection
+from ..config import STATS_HOURS_RETAINED
+
+logger = logging.getLogger(__name__)
+
+# Gauge: number of files currently in each status
+STATUS_COUNTS_KEY = "nexus:stats:status"
+# Cumulative counters: pages processed, AI requests and tokens
+TOTALS_KEY = "nexus:stats:totals"
+# Cumulative stale job recoveries, written by the reaper
+REAPER_STATS_KEY = "nexus:reaper"
+# Hourly buckets of the above plus status transitions, e.g. nexus:stats:hour:2026101912
+HOUR_KEY_PREFIX = "nexus:stats:hour:"
+
+def hour_bucket(moment: Optional[datetime] = None) -> str:
+    """UTC hour bucket id for a timestamp"""
+    return (moment or datetime.utcnow()).strftime("%Y%m%d%H")
+
+def increment_counters(counters: Dict[str, int], status_deltas: Optional[Dict[str, int]] = None) -> None:
+    """Apply counter increments in one round trip; stats never fail the caller"""
+    try:
+        hour_key = HOUR_KEY_PREFIX + hour_bucket()
+        pipe = get_redis_client().pipeline(transaction=False)
+        for status, delta in (status_deltas or {}).items():
+            pipe.hincrby(STATUS_COUNTS_KEY, status, delta)
+        for field, amount in counters.items():
+            if not field.startswith("entered:"):
+                pipe.hincrby(TOTALS_KEY, field, amount)
+            pipe.hincrby(hour_key, field, amount)
+        pipe.expire(hour_key, STATS_HOURS_RETAINED * 3600)
+        pipe.execute()
+    except Exception as e:
+        logger.warning("Failed to record stats: %s", e)
+
+def record_status_change(old_status: Optional[str], new_status: Optional[str]) -> None:
+    """Track a file moving between statuses; None means created or deleted"""
+    if old_status == new_status:
+        return
+    status_deltas = {}
+    if old_status:
+        status_deltas[old_status] = -1
+    if new_status:
+        status_deltas[new_status] = 1
+    counters = {f"entered:{new_status}": 1} if new_status else {}
+    increment_counters(counters, status_deltas)
+
+def record_pages_processed(page_count: int) -> None:
+    """Count pages that went through AI analysis"""
+    increment_counters({"pages_processed": page_count})
+
+def record_ai_usage(prompt_tokens: int, completion_tokens: int) -> None:
+    """Count one AI request and its token usage"""
+    increment_counters({
+        "ai_requests": 1,
+        "ai_prompt_tokens": prompt_tokens,
+        "ai_completion_tokens": completion_tokens
+    })
+
+def get_stats(hours: int = 24) -> Dict[str, Any]:
+    """Read status gauges, totals and the last `hours` hourly buckets"""
+    now = datetime.utcnow()
+    buckets = [hour_bucket(now - timedelta(hours=i)) for i in range(hours)]
+
+    pipe = get_redis_client().pipeline(transaction=False)
+    pipe.hgetall(STATUS_COUNTS_KEY)
+    pipe.hgetall(TOTALS_KEY)
+    pipe.hgetall(REAPER_STATS_KEY)
+    for bucket in buckets:
+        pipe.hgetall(HOUR_KEY_PREFIX + bucket)
+    status_counts, totals, reaper, *hourly = pipe.execute()
+
+    def as_ints(values: Dict[str, str]) -> Dict[str, int]:
+        return {key: int(value) for key, value in values.items()}
+
+    return {
+        "status_counts": {status: count for status, count in as_ints(status_counts).items() if count},
+        "totals": as_ints(totals),
+        "reaper": as_ints(reaper),
+        "hourly": [
+            {"hour": bucket, **as_ints(values)}
+            for bucket, values in zip(buckets, hourly)
+            if values
+        ]
+    }
+
+async def reconcile_status_counts() -> Dict[str, int]:
+    """Recount files per status in Mongo and overwrite the Redis gauges"""
+    cursor = await get_files_collection().aggregate([
+        {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+    ])
+    counts = {str(row["_id"]): row["count"] async for row in cursor}
+
+    pipe = get_redis_client().pipeline(transaction=True)
+    pipe.delete(STATUS_COUNTS_KEY)
+    if counts:
+        pipe.hset(STATUS_COUNTS_KEY, mapping=counts)
+    pipe.execute()
+
+    logger.info("Reconciled status counts: %s", counts)
+    return counts
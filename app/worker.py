@@ -0,0 +1,49 @@
+import asyncio
+import logging
+import signal
+
+from rq import Queue, Worker
+
+from .queue.queue import get_queue
+from .db.client import close_mongo_client
+from .config import WORKER_PIPELINED
+from .utils.logger import setup_logging
+
+logger = logging.getLogger(__name__)
+
+async def run_pipelined(queue: Queue):
+    """Run the pipelined worker until SIGINT/SIGTERM"""
+    from .queue.pipeline import PipelinedWorker
+
+    worker = PipelinedWorker(queue)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+
+    try:
+        await worker.run()
+    finally:
+        await close_mongo_client()
+
+def main():
+    """Worker entry point"""
+    setup_logging()
+
+    # Import the heavy rendering/AI stack once in the parent process so
+    # forked job processes inherit it instead of re-importing per job; the
+    # logging at-fork hook makes those processes write their records directly
+    from .queue import workers  # noqa: F401
+
+    queue = get_queue()
+
+    if WORKER_PIPELINED:
+        logger.info("Starting pipelined worker for queue %s", queue.name)
+        asyncio.run(run_pipelined(queue))
+        return
+
+    worker = Worker([queue], connection=queue.connection)
+    logger.info("Starting worker for queue %s", queue.name)
+    worker.work()
+
+if __name__ == "__main__":
+    main()
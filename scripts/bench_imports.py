@@ -0,0 +1,74 @@
+"""Measure cold import time of the API and worker entry points.
+
+Usage: python scripts/bench_imports.py [--runs N]
+
+Each module is imported in a fresh interpreter so results reflect a cold
+start. The API graph is also checked for heavy worker-only dependencies.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENTRY_POINTS = {
+    "api": "app.server",
+    "worker": "app.worker",
+}
+
+# Modules that only the worker process should ever load
+WORKER_ONLY_MODULES = ["pdf2image", "openai", "PIL"]
+
+# Clients are constructed lazily, so placeholder settings are enough to import
+PLACEHOLDER_ENV = {
+    "MONGO_URI": "mongodb://localhost:27017",
+    "REDIS_PASS": "placeholder",
+    "GEMINI_API_KEY": "placeholder",
+}
+
+def run_python(code: str) -> str:
+    env = {**PLACEHOLDER_ENV, **os.environ}
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return result.stdout.strip()
+
+def time_import(module: str) -> float:
+    code = (
+        "import time; start = time.perf_counter(); "
+        f"import {module}; "
+        "print(time.perf_counter() - start)"
+    )
+    return float(run_python(code))
+
+def loaded_worker_modules(module: str) -> list[str]:
+    code = (
+        f"import sys, {module}; "
+        f"print(','.join(m for m in {WORKER_ONLY_MODULES!r} if m in sys.modules))"
+    )
+    output = run_python(code)
+    return output.split(",") if output else []
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    for name, module in ENTRY_POINTS.items():
+        timings = [time_import(module) for _ in range(args.runs)]
+        print(
+            f"{name:<7} {module:<20} median {statistics.median(timings) * 1000:7.1f} ms  "
+            f"min {min(timings) * 1000:7.1f} ms"
+        )
+
+    leaked = loaded_worker_modules(ENTRY_POINTS["api"])
+    if leaked:
+        print(f"API import graph pulls in worker-only modules: {', '.join(leaked)}")
+        sys.exit(1)
+    print("API import graph is free of worker-only modules")
+
+if __name__ == "__main__":
+    main()